@@ -28,9 +28,8 @@ about face recognition techniques.
 import sys
 from pathlib import Path
 import argparse
-from src.interactive import interactive_menu
-from src.app import main as run_app
-from src.hyperparameter_tuning import run_hyperparameter_tuning, MODEL_TYPES
+# The src modules pull in torch, matplotlib etc., so each command below
+# imports only what it needs (help doesn't load any of them)
 
 def show_usage():
     print("Face Recognition Project - Simplified Version")
@@ -43,6 +42,7 @@ def show_usage():
     print("  python run.py help        - Show this help message")
 
 def parse_args():
+    from src.hyperparameter_tuning import MODEL_TYPES
     parser = argparse.ArgumentParser(description='Face Recognition System')
     subparsers = parser.add_subparsers(dest='command', help='Command to run')
     
@@ -66,6 +66,14 @@ def parse_args():
                                help='Number of epochs for training with best parameters (default: 50)')
     hyperopt_parser.add_argument('--use-lr-finder', action='store_true',
                                help='Use learning rate finder to determine optimal learning rates')
+    hyperopt_parser.add_argument('--n-jobs', type=int, default=1,
+                               help='Only 1 is supported; for parallel trials run several workers '
+                                    'sharing --storage and --study-name (default: 1)')
+    hyperopt_parser.add_argument('--storage', type=str,
+                               help='Shared Optuna storage URL; run several workers with the same '
+                                    '--storage and --study-name to split trials between them')
+    hyperopt_parser.add_argument('--study-name', type=str,
+                               help='Study name inside the shared storage (default: <model>_<dataset>)')
     
     # ArcFace-specific parameters
     hyperopt_parser.add_argument('--arcface-margin', type=float, default=0.5,
@@ -89,9 +97,11 @@ if __name__ == "__main__":
     # Process command line arguments
     if len(sys.argv) == 1 or sys.argv[1] == "interactive":
         # Run interactive mode
+        from src.interactive import interactive_menu
         interactive_menu()
     elif sys.argv[1] == "demo":
         # Run demo app
+        from src.app import main as run_app
         run_app()
     elif sys.argv[1] == "cv":
         # Run cross-validation
@@ -108,13 +118,17 @@ if __name__ == "__main__":
                 sys.exit(1)
             
             # Run hyperparameter tuning with parsed arguments
+            from src.hyperparameter_tuning import run_hyperparameter_tuning
             results = run_hyperparameter_tuning(
                 model_type=args.model_type,
                 dataset_path=dataset_path,
                 n_trials=args.n_trials,
                 timeout=args.timeout,
                 use_trial0_baseline=args.use_trial0_baseline,
-                keep_checkpoints=args.keep_checkpoints
+                keep_checkpoints=args.keep_checkpoints,
+                n_jobs=args.n_jobs,
+                storage=args.storage,
+                study_name=args.study_name
             )
             
             if results and args.train_best:
@@ -5,22 +5,29 @@ A system to help those with Alzheimer's recognize their loved ones through
 computer vision and machine learning.
 """
 
-# Updated imports to match my renamed variables from base_config
-from .base_config import PROJECT_ROOT, DATA_DIR, MODELS_DIR, OUT_DIR, PROC_DATA_DIR
-from .face_models import (
-    BaselineNet, ResNetTransfer, SiameseNet, AttentionNet, ArcFaceNet, HybridNet,
-    get_model, get_criterion
-)
-from .data_prep import (
-    PreprocessingConfig, process_raw_data, get_preprocessing_config,
-    preprocess_image, align_face
-)
-from .training import (
-    train_model, tune_hyperparameters, SiameseDataset
-)
-from .testing import (
-    evaluate_model, predict_image
-)
+# Names re-exported from the submodules. They're imported on first access
+# (PEP 562 module __getattr__), so `import src` doesn't load torch and the
+# rest of the training stack until something actually needs them.
+_EXPORTS = {
+    # Updated imports to match my renamed variables from base_config
+    'PROJECT_ROOT': 'base_config', 'DATA_DIR': 'base_config', 'MODELS_DIR': 'base_config',
+    'OUT_DIR': 'base_config', 'PROC_DATA_DIR': 'base_config',
+    'BaselineNet': 'face_models', 'ResNetTransfer': 'face_models', 'SiameseNet': 'face_models',
+    'AttentionNet': 'face_models', 'ArcFaceNet': 'face_models', 'HybridNet': 'face_models',
+    'get_model': 'face_models', 'get_criterion': 'face_models',
+    'PreprocessingConfig': 'data_prep', 'process_raw_data': 'data_prep',
+    'get_preprocessing_config': 'data_prep', 'preprocess_image': 'data_prep', 'align_face': 'data_prep',
+    'train_model': 'training', 'tune_hyperparameters': 'training', 'SiameseDataset': 'training',
+    'evaluate_model': 'testing', 'predict_image': 'testing',
+}
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        import importlib
+        value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+        globals()[name] = value  # Cache so later lookups skip this function
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # This helps with proper importing, easier to add modules this way
 __all__ = [
@@ -117,6 +117,36 @@ def calculate_per_class_metrics(y_true: np.ndarray, y_pred: np.ndarray,
     return results
 
 
+def bincount_confusion_matrix(y_true: np.ndarray, y_pred: np.ndarray, n_classes: int) -> np.ndarray:
+    """
+    Confusion matrix in one pass over the labels (rows = true, cols = predicted).
+    
+    Same result as sklearn's confusion_matrix with labels=range(n_classes), but
+    it's a single bincount so it can be computed once and shared.
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    y_pred = np.asarray(y_pred, dtype=np.int64)
+    return np.bincount(n_classes * y_true + y_pred, minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+
+
+def metrics_from_confusion_matrix(cm: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per-class precision, recall, f1 and support read off a confusion matrix.
+    
+    Classes with no predictions/samples get 0, like zero_division=0 in sklearn.
+    """
+    true_positives = np.diag(cm).astype(np.float64)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, true_positives / predicted, 0.0)
+        recall = np.where(support > 0, true_positives / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    
+    return precision, recall, f1, support
+
+
 def create_enhanced_confusion_matrix(y_true: np.ndarray, y_pred: np.ndarray, 
                                     class_names: List[str]) -> Dict[str, Any]:
     """
@@ -28,19 +28,23 @@ _save_counter = 0  # Simple counter for unique filenames
 # Face tracking constants
 TRACKING_THRESHOLD = 0.3  # IOU threshold for face tracking between frames
 
+# These normalization values work best with the VGGFace2 model
+# Built once here instead of for every face in every frame
+PREPROCESS = transforms.Compose([
+    transforms.Resize((160, 160)), transforms.ToTensor(),
+    transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5]),
+])
+
 # Face processing functions
-def get_embedding(face_img, model):
+def get_embedding(face_img, model, device=None):
     """Extract face embedding using the model"""
     if face_img is None or face_img.size == 0: return None
     try:
         # Had issues with color format conversion - be explicit about BGR to RGB
         pil_img = Image.fromarray(cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB))
-        # These normalization values work best with the VGGFace2 model
-        preprocess = transforms.Compose([
-            transforms.Resize((160, 160)), transforms.ToTensor(),
-            transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5]),
-        ])
-        face_tensor = preprocess(pil_img).unsqueeze(0).to(next(model.parameters()).device)
+        if device is None:
+            device = next(model.parameters()).device
+        face_tensor = PREPROCESS(pil_img).unsqueeze(0).to(device)
         with torch.no_grad(): emb = model(face_tensor)
         return emb
     except Exception as e:
@@ -159,6 +163,8 @@ def process_webcam(stop_event, result_q, detector, model, skip_n):
         return
     
     frame_count = 0
+    # The model doesn't move while the webcam runs, look its device up once
+    model_device = next(model.parameters()).device
     # Track faces between frames
     prev_boxes = []
     face_ids = []
@@ -233,7 +239,7 @@ def process_webcam(stop_event, result_q, detector, model, skip_n):
                         if x2 > x1 and y2 > y1:
                             face = frame[y1:y2, x1:x2]
                             if face.size > 0:
-                                emb = get_embedding(face, model)
+                                emb = get_embedding(face, model, model_device)
                                 if emb is not None:
                                     faces.append({
                                         'box': box, 'prob': prob, 'image': face, 
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import os
+import math
 import logging
 from pathlib import Path
 import sys
@@ -85,6 +86,48 @@ def check_gpu():
         logger.warning("PyTorch not installed, cannot check GPU")
         return False
 
+def _json_safe(obj):
+    """Mirror orjson's output for the stdlib json: numpy -> lists, NaN/inf -> null."""
+    if isinstance(obj, np.ndarray) and obj.dtype == np.float32 and obj.ndim:
+        return [_json_safe(v) for v in obj]
+    if isinstance(obj, np.float32):
+        # float() would give float32's full binary expansion (0.10000000149011612);
+        # str() is the shortest repr that round-trips, which is what orjson writes
+        obj = float(str(obj))
+    elif isinstance(obj, (np.generic, np.ndarray)):
+        obj = obj.tolist()
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _json_safe(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_json_safe(v) for v in obj]
+    return obj
+
+# Writes the CV/hyperopt reports. orjson is optional - it's a C extension and
+# handles numpy scalars natively, the stdlib json is the fallback. Both paths
+# write the same values: 2-space indent, NaN as null, float32 at float32
+# precision, int keys allowed, and a TypeError for anything that isn't plain
+# data. (Not byte-identical - e.g. orjson writes 1e20 where json writes 1e+20)
+def save_json(data, path):
+    """Write data to path as indented JSON (numpy scalars/arrays allowed).
+    
+    The file is written next to path and renamed into place, so anything
+    reading the report never sees it half written.
+    """
+    try:
+        import orjson
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY |
+                               orjson.OPT_NON_STR_KEYS)
+    except ImportError:
+        import json
+        payload = json.dumps(_json_safe(data), indent=2, allow_nan=False, ensure_ascii=False).encode()
+    
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_bytes(payload)
+    os.replace(tmp_path, path)
+
 # Old validation split function I replaced - keeping for reference
 # def split_dataset(data_dir, train=0.7, val=0.2, test=0.1):
 #     """Split dataset into train/val/test."""
@@ -5,25 +5,36 @@ Simple cross-validation module for face recognition models.
 """
 
 import os
-import json
 import torch
 import numpy as np
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 from sklearn.model_selection import KFold
 from torch.utils.data import DataLoader, SubsetRandomSampler
-from torchvision import datasets, transforms
+from torchvision import transforms
 
-from .base_config import PROC_DATA_DIR, CHECKPOINTS_DIR, logger, OUT_DIR
-from .face_models import get_model, get_criterion
+from .base_config import PROC_DATA_DIR, CHECKPOINTS_DIR, logger, OUT_DIR, save_json
+from .face_models import get_model, get_criterion, CHANNELS_LAST_MODEL_TYPES
 from .training import train_model
-from .data_utils import SiameseDataset
+from .data_utils import SiameseDataset, DecodedImageDataset, DeviceNormalize, prefetch_to_device
+
+# KFold splits depend only on the sample count, fold count and seed, so CV runs
+# for several models on the same dataset can share them
+_KFOLD_SPLITS = {}
+
+def _get_kfold_splits(n_samples: int, n_folds: int, random_seed: int):
+    key = (n_samples, n_folds, random_seed)
+    if key not in _KFOLD_SPLITS:
+        kf = KFold(n_splits=n_folds, shuffle=True, random_state=random_seed)
+        _KFOLD_SPLITS[key] = tuple(kf.split(np.arange(n_samples)))
+    return _KFOLD_SPLITS[key]
 
 def run_cross_validation(model_type: Optional[str] = None, 
                         dataset_path: Optional[Path] = None,
                         n_folds: int = 5,
                         random_seed: int = 42,
-                        existing_model: Optional[str] = None):
+                        existing_model: Optional[str] = None,
+                        num_workers: Optional[int] = None):
     """Run k-fold cross-validation for a model.
     
     Args:
@@ -32,6 +43,7 @@ def run_cross_validation(model_type: Optional[str] = None,
         n_folds: Number of folds for cross-validation
         random_seed: Random seed for reproducibility
         existing_model: Optional name of an existing model to use as a starting point
+        num_workers: DataLoader worker processes (default: up to 4, one per CPU core)
     """
     # Use interactive selection if model_type or dataset_path not provided
     if model_type is None:
@@ -79,6 +91,16 @@ def run_cross_validation(model_type: Optional[str] = None,
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     logger.info(f"Using device: {device}")
     
+    # Every batch is 224x224, so let cuDNN benchmark and keep the fastest conv algorithms.
+    # Set once for the whole run: the choice is cached per shape, so folds 2..k reuse it.
+    # TF32 matmuls (Ampere+) speed up the linear/attention layers; convs already use TF32
+    if device.type == 'cuda':
+        torch.backends.cudnn.benchmark = True
+        torch.backends.cuda.matmul.allow_tf32 = True
+    
+    # NHWC layout for the models that support it (faster tensor-core convs)
+    memory_format = torch.channels_last if model_type in CHANNELS_LAST_MODEL_TYPES else torch.preserve_format
+    
     # Setup data transforms
     transform = transforms.Compose([
         transforms.Resize((224, 224)),
@@ -87,14 +109,22 @@ def run_cross_validation(model_type: Optional[str] = None,
                           std=[0.229, 0.224, 0.225])
     ])
     
-    # Load dataset
+    if num_workers is None:
+        num_workers = min(4, os.cpu_count() or 1)
+    
+    # Load dataset. The CV transform has no augmentation, so classifier images are
+    # decoded once into a memmap cache and every fold/epoch reads them back from there.
+    # They come out as uint8 and are normalized once they're on the device
+    normalize = None
     if model_type == 'siamese':
         dataset = SiameseDataset(str(dataset_path / "train"), transform=transform)
     else:
-        dataset = datasets.ImageFolder(dataset_path / "train", transform=transform)
+        dataset = DecodedImageDataset(dataset_path / "train", cache_dir=dataset_path / "_memmap",
+                                      num_workers=num_workers, normalize=False)
+        normalize = DeviceNormalize(device)
     
     # Setup k-fold cross validation
-    kf = KFold(n_splits=n_folds, shuffle=True, random_state=random_seed)
+    splits = _get_kfold_splits(len(dataset), n_folds, random_seed)
     
     # Setup results tracking
     fold_results = []
@@ -120,25 +150,28 @@ def run_cross_validation(model_type: Optional[str] = None,
                 logger.error(f"Failed to load model state: {str(e)}")
                 initial_model_state = None
     
+    # The loaders are built once and reused by every fold; each fold only swaps
+    # the sampler indices. Persistent workers (and their pinned-memory buffers)
+    # then survive across folds instead of being set up again k times
+    loader_kwargs = dict(batch_size=32, num_workers=num_workers, pin_memory=device.type == 'cuda')
+    if num_workers > 0:
+        loader_kwargs.update(persistent_workers=True, prefetch_factor=2)
+    
+    train_sampler = SubsetRandomSampler([])
+    val_sampler = SubsetRandomSampler([])
+    train_loader = DataLoader(dataset, sampler=train_sampler, **loader_kwargs)
+    val_loader = DataLoader(dataset, sampler=val_sampler, **loader_kwargs)
+    
     # Cross validation loop
-    for fold, (train_idx, val_idx) in enumerate(kf.split(np.arange(len(dataset)))):
-        print(f"\n{'='*80}")
-        print(f"Fold {fold+1}/{n_folds}")
-        print(f"{'='*80}")
+    for fold, (train_idx, val_idx) in enumerate(splits):
+        # Per-fold progress goes through the logger (lazy %-formatting) like the epoch lines
+        logger.info("%s", '=' * 80)
+        logger.info("Fold %d/%d", fold + 1, n_folds)
+        logger.info("%s", '=' * 80)
         
-        # Create data samplers
-        train_sampler = SubsetRandomSampler(train_idx)
-        val_sampler = SubsetRandomSampler(val_idx)
-        
-        # Create data loaders
-        train_loader = DataLoader(
-            dataset, batch_size=32, sampler=train_sampler,
-            num_workers=2, pin_memory=True
-        )
-        val_loader = DataLoader(
-            dataset, batch_size=32, sampler=val_sampler,
-            num_workers=2, pin_memory=True
-        )
+        # Point the shared samplers at this fold's split
+        train_sampler.indices = train_idx
+        val_sampler.indices = val_idx
         
         # Initialize model
         num_classes = len(dataset.classes) if model_type != 'siamese' else 2
@@ -148,18 +181,18 @@ def run_cross_validation(model_type: Optional[str] = None,
         if initial_model_state is not None:
             try:
                 model.load_state_dict(initial_model_state)
-                logger.info(f"Loaded initial weights for fold {fold+1}")
+                logger.info("Loaded initial weights for fold %d", fold + 1)
             except Exception as e:
                 logger.error(f"Failed to load initial weights for fold {fold+1}: {str(e)}")
         
-        model = model.to(device)
+        model = model.to(device, memory_format=memory_format)
         
         # Setup training
         criterion = get_criterion(model_type)
         optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
         
         # Train the model
-        print(f"Training model for fold {fold+1}...")
+        logger.info("Training model for fold %d...", fold + 1)
         fold_dir = cv_output_dir / f"fold_{fold+1}"
         fold_dir.mkdir(parents=True, exist_ok=True)
         
@@ -172,16 +205,18 @@ def run_cross_validation(model_type: Optional[str] = None,
             model.train()
             train_loss = 0.0
             
+            # The loaders pin their batches, so the copies below can be async
             for batch in train_loader:
                 if model_type == 'siamese':
                     img1, img2, target = batch
-                    img1, img2, target = img1.to(device), img2.to(device), target.to(device)
+                    img1, img2, target = img1.to(device, non_blocking=True), img2.to(device, non_blocking=True), target.to(device, non_blocking=True)
                     optimizer.zero_grad()
                     out1, out2 = model(img1, img2)
                     loss = criterion(out1, out2, target)
                 else:
                     data, target = batch
-                    data, target = data.to(device), target.to(device)
+                    data = normalize(data.to(device, non_blocking=True, memory_format=memory_format))
+                    target = target.to(device, non_blocking=True)
                     optimizer.zero_grad()
                     
                     # Handle ArcFace differently
@@ -198,25 +233,29 @@ def run_cross_validation(model_type: Optional[str] = None,
             
             # Validation phase
             model.eval()
-            val_loss = 0.0
-            correct = 0
-            total = 0
+            # Per-batch losses/predictions stay on the device; one sync per epoch
+            val_losses = []
+            val_preds = []
+            val_targets = []
             
-            with torch.no_grad():
-                for batch in val_loader:
+            # inference_mode skips autograd bookkeeping entirely. Not for ArcFace (or
+            # the ensemble that contains one): its eval forward rewrites
+            # val_classifier.weight.data, which must not become an inference tensor
+            with torch.no_grad(), torch.inference_mode(model_type not in ('arcface', 'ensemble')):
+                # Batches arrive on the device; the next one is copied while this one runs
+                for batch in prefetch_to_device(val_loader, device, memory_format):
                     if model_type == 'siamese':
                         img1, img2, target = batch
-                        img1, img2, target = img1.to(device), img2.to(device), target.to(device)
                         out1, out2 = model(img1, img2)
-                        val_loss += criterion(out1, out2, target).item()
+                        val_losses.append(criterion(out1, out2, target))
                         # Calculate distances and predict
                         dist = torch.nn.functional.pairwise_distance(out1, out2)
                         pred = (dist < 0.5).float()
-                        correct += pred.eq(target.view_as(pred)).sum().item()
-                        total += target.size(0)
+                        val_preds.append(pred)
+                        val_targets.append(target.view_as(pred))
                     else:
                         data, target = batch
-                        data, target = data.to(device), target.to(device)
+                        data = normalize(data)
                         
                         # Handle ArcFace differently during validation
                         if model_type == 'arcface':
@@ -229,10 +268,15 @@ def run_cross_validation(model_type: Optional[str] = None,
                             output = model(data)
                             logits = output
                         
-                        val_loss += criterion(logits, target).item()
+                        val_losses.append(criterion(logits, target))
                         _, pred = logits.max(1)
-                        correct += pred.eq(target).sum().item()
-                        total += target.size(0)
+                        val_preds.append(pred)
+                        val_targets.append(target)
+            
+            val_loss = torch.stack(val_losses).sum().item()
+            val_targets = torch.cat(val_targets)
+            correct = torch.cat(val_preds).eq(val_targets).sum().item()
+            total = val_targets.numel()
             
             # Calculate epoch metrics
             epoch_loss = train_loss / len(train_loader)
@@ -240,8 +284,9 @@ def run_cross_validation(model_type: Optional[str] = None,
             accuracy = correct / total
             
             # Log metrics to console
-            logger.info(f'Fold {fold+1}, Epoch {epoch+1}/{epochs}:')
-            logger.info(f'Train Loss: {epoch_loss:.4f}, Val Loss: {val_epoch_loss:.4f}, Accuracy: {accuracy*100:.2f}%')
+            logger.info('Fold %d, Epoch %d/%d:', fold + 1, epoch + 1, epochs)
+            logger.info('Train Loss: %.4f, Val Loss: %.4f, Accuracy: %.2f%%',
+                        epoch_loss, val_epoch_loss, accuracy * 100)
             
             # Save best model for this fold
             if accuracy > best_val_acc:
@@ -255,13 +300,13 @@ def run_cross_validation(model_type: Optional[str] = None,
         })
         
         # Save fold results
-        with open(fold_dir / 'results.json', 'w') as f:
-            json.dump(fold_results[-1], f, indent=2)
+        save_json(fold_results[-1], fold_dir / 'results.json')
     
     # Calculate cross-validation statistics
-    accuracies = [result['best_validation_accuracy'] for result in fold_results]
-    mean_acc = np.mean(accuracies)
-    std_acc = np.std(accuracies)
+    accuracies = np.fromiter((result['best_validation_accuracy'] for result in fold_results),
+                             dtype=np.float64, count=len(fold_results))
+    mean_acc = accuracies.mean()
+    std_acc = accuracies.std()
     
     # Compile and save final CV results
     cv_final_results = {
@@ -274,8 +319,7 @@ def run_cross_validation(model_type: Optional[str] = None,
         'existing_model': existing_model  # Add the existing model info to results
     }
     
-    with open(cv_output_dir / 'cv_results.json', 'w') as f:
-        json.dump(cv_final_results, f, indent=2)
+    save_json(cv_final_results, cv_output_dir / 'cv_results.json')
     
     print(f"\nCross-validation complete!")
     print(f"Mean accuracy: {mean_acc*100:.2f}% ± {std_acc*100:.2f}%")
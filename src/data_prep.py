@@ -13,6 +13,7 @@ from facenet_pytorch import MTCNN
 import albumentations as A
 from pathlib import Path
 from typing import Dict, Optional, List, Tuple, Union, Any
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 
 from .base_config import PROJECT_ROOT, RAW_DATA_DIR, PROC_DATA_DIR, VIZ_DIR, logger, get_user_confirmation
@@ -66,6 +67,15 @@ class PreprocessingConfig:
                 
         return config
 
+# Raw image types we pick up (case-sensitive, same as the old glob patterns)
+IMAGE_SUFFIXES = ('.jpg', '.png', '.jpeg')
+
+def list_image_files(directory: Path) -> List[Path]:
+    """List the image files directly inside directory in one scandir pass."""
+    with os.scandir(directory) as entries:
+        return [Path(e.path) for e in entries
+                if e.name.endswith(IMAGE_SUFFIXES) and e.is_file()]
+
 def align_face(image: np.ndarray, landmarks: np.ndarray) -> np.ndarray:
     """Align face based on eye landmarks."""
     left_eye = landmarks[0]
@@ -200,6 +210,153 @@ def visualize_preprocessing_steps(image_path: str, config: PreprocessingConfig,
         logger.error(f"Error processing image {image_path}: {str(e)}")
         return None
 
+def _process_dataset(source_path: Path, source_name: str, target_name: str, base_output_dir: Path,
+                     config: PreprocessingConfig, test_mode: bool = False,
+                     max_samples_per_class: Optional[int] = None, position: int = 0,
+                     seed: Optional[int] = None):
+    """Split and preprocess one raw dataset into train/val/test folders.
+    
+    position is the tqdm bar row, so datasets processed side by side don't
+    draw over each other. seed drives this dataset's own shuffle, so the split
+    doesn't depend on how the threads happen to interleave.
+    """
+    rng = random.Random(seed)
+    print(f"Processing {source_name} as {target_name}...")
+    
+    # Set up output directory for this dataset
+    dataset_output_dir = base_output_dir / target_name
+    
+    # Create train/val/test subdirectories
+    train_dir = dataset_output_dir / "train"
+    val_dir = dataset_output_dir / "val"
+    test_dir = dataset_output_dir / "test"
+    
+    # Create directories
+    train_dir.mkdir(parents=True, exist_ok=True)
+    val_dir.mkdir(parents=True, exist_ok=True)
+    test_dir.mkdir(parents=True, exist_ok=True)
+    
+    # Get list of person directories
+    person_dirs = [d for d in source_path.iterdir() if d.is_dir()]
+    
+    # Limit the number of persons in test mode
+    if test_mode:
+        person_dirs = person_dirs[:3]  # Only process 3 persons for testing
+        print(f"Test mode: only processing {len(person_dirs)} persons")
+    
+    # Process each person's directory
+    for person_dir in tqdm(person_dirs, desc=f"Processing {source_name}", position=position):
+        person_name = person_dir.name
+        
+        # Create person directories in train/val/test
+        train_person_dir = train_dir / person_name
+        val_person_dir = val_dir / person_name
+        test_person_dir = test_dir / person_name
+        
+        train_person_dir.mkdir(exist_ok=True)
+        val_person_dir.mkdir(exist_ok=True)
+        test_person_dir.mkdir(exist_ok=True)
+        
+        # Get all image files for this person
+        image_files = list_image_files(person_dir)
+        
+        # Skip if no images found
+        if not image_files:
+            print(f"No images found for {person_name}, skipping")
+            continue
+        
+        # Shuffle images for random selection and split
+        rng.shuffle(image_files)
+        
+        # Limit the number of images if max_samples_per_class is set
+        if max_samples_per_class is not None:
+            image_files = image_files[:max_samples_per_class]
+            print(f"Using {len(image_files)} images for {person_name}")
+        
+        # Limit the number of images in test mode
+        if test_mode:
+            image_files = image_files[:10]  # Only process 10 images per person for testing
+        
+        # Split into train/val/test
+        train_ratio, val_ratio = 0.7, 0.15  # 70% train, 15% val, 15% test
+        
+        train_size = int(len(image_files) * train_ratio)
+        val_size = int(len(image_files) * val_ratio)
+        
+        train_files = image_files[:train_size]
+        val_files = image_files[train_size:train_size + val_size]
+        test_files = image_files[train_size + val_size:]
+        
+        # Process training images
+        for img_path in train_files:
+            # Process and save image
+            processed_img = preprocess_image(str(img_path), config)
+            if processed_img:
+                output_path = train_person_dir / img_path.name
+                processed_img.save(str(output_path))
+        
+        # Process validation images
+        for img_path in val_files:
+            processed_img = preprocess_image(str(img_path), config)
+            if processed_img:
+                output_path = val_person_dir / img_path.name
+                processed_img.save(str(output_path))
+        
+        # Process test images
+        for img_path in test_files:
+            processed_img = preprocess_image(str(img_path), config)
+            if processed_img:
+                output_path = test_person_dir / img_path.name
+                processed_img.save(str(output_path))
+        
+        # Apply augmentation to training set if enabled and there are few images
+        if config.augmentation and len(train_files) < 20:
+            # Add 5 augmented images for each original image
+            print(f"Augmenting training data for {person_name}")
+            
+            # Get existing processed images
+            processed_train_files = list(train_person_dir.glob("*.jpg"))
+            
+            # Skip if no processed images
+            if not processed_train_files:
+                continue
+            
+            # Apply augmentation
+            from PIL import Image
+            import albumentations as A
+            
+            # Define augmentation pipeline
+            transform = A.Compose([
+                A.Rotate(limit=config.aug_rotation_range, p=0.7),
+                A.RandomBrightnessContrast(
+                    brightness_limit=config.aug_brightness_range,
+                    contrast_limit=config.aug_contrast_range,
+                    p=0.7
+                ),
+                A.RandomScale(scale_limit=config.aug_scale_range, p=0.5),
+                A.HorizontalFlip(p=0.5 if config.horizontal_flip else 0),
+            ])
+            
+            for idx, img_path in enumerate(processed_train_files):
+                # Only augment a subset of images to avoid too many images
+                if idx >= min(10, len(processed_train_files)):
+                    break
+                    
+                # Load image
+                img = Image.open(img_path)
+                img_array = np.array(img)
+                
+                # Create 5 augmented versions
+                for aug_idx in range(5):
+                    augmented = transform(image=img_array)
+                    aug_img = Image.fromarray(augmented['image'])
+                    
+                    # Save augmented image
+                    aug_path = train_person_dir / f"{img_path.stem}_aug{aug_idx}{img_path.suffix}"
+                    aug_img.save(str(aug_path))
+    
+    print(f"Finished processing {source_name} as {target_name}")
+
 def process_raw_data(raw_data_dir, output_dir, config=None, test_mode=False, max_samples_per_class=None):
     """Process raw image data for face recognition.
     
@@ -213,7 +370,6 @@ def process_raw_data(raw_data_dir, output_dir, config=None, test_mode=False, max
     Returns:
         Path: Base output directory containing processed data
     """
-    import random
     from tqdm import tqdm
     
     # Look for the raw folders with your specific names
@@ -257,145 +413,25 @@ def process_raw_data(raw_data_dir, output_dir, config=None, test_mode=False, max
             device=device
         )
     
-    # Automatically detect and process each dataset
-    for source_name, target_name in dataset_mapping.items():
-        source_path = raw_data_dir / source_name
-        if source_path.exists():
-            print(f"Processing {source_name} as {target_name}...")
-            
-            # Set up output directory for this dataset
-            dataset_output_dir = base_output_dir / target_name
-            
-            # Create train/val/test subdirectories
-            train_dir = dataset_output_dir / "train"
-            val_dir = dataset_output_dir / "val"
-            test_dir = dataset_output_dir / "test"
-            
-            # Create directories
-            train_dir.mkdir(parents=True, exist_ok=True)
-            val_dir.mkdir(parents=True, exist_ok=True)
-            test_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Get list of person directories
-            person_dirs = [d for d in source_path.iterdir() if d.is_dir()]
-            
-            # Limit the number of persons in test mode
-            if test_mode:
-                person_dirs = person_dirs[:3]  # Only process 3 persons for testing
-                print(f"Test mode: only processing {len(person_dirs)} persons")
-            
-            # Process each person's directory
-            for person_dir in tqdm(person_dirs, desc=f"Processing {source_name}"):
-                person_name = person_dir.name
-                
-                # Create person directories in train/val/test
-                train_person_dir = train_dir / person_name
-                val_person_dir = val_dir / person_name
-                test_person_dir = test_dir / person_name
-                
-                train_person_dir.mkdir(exist_ok=True)
-                val_person_dir.mkdir(exist_ok=True)
-                test_person_dir.mkdir(exist_ok=True)
-                
-                # Get all image files for this person
-                image_files = list(person_dir.glob("*.jpg")) + list(person_dir.glob("*.png")) + list(person_dir.glob("*.jpeg"))
-                
-                # Skip if no images found
-                if not image_files:
-                    print(f"No images found for {person_name}, skipping")
-                    continue
-                
-                # Shuffle images for random selection and split
-                random.shuffle(image_files)
-                
-                # Limit the number of images if max_samples_per_class is set
-                if max_samples_per_class is not None:
-                    image_files = image_files[:max_samples_per_class]
-                    print(f"Using {len(image_files)} images for {person_name}")
-                
-                # Limit the number of images in test mode
-                if test_mode:
-                    image_files = image_files[:10]  # Only process 10 images per person for testing
-                
-                # Split into train/val/test
-                train_ratio, val_ratio = 0.7, 0.15  # 70% train, 15% val, 15% test
-                
-                train_size = int(len(image_files) * train_ratio)
-                val_size = int(len(image_files) * val_ratio)
-                
-                train_files = image_files[:train_size]
-                val_files = image_files[train_size:train_size + val_size]
-                test_files = image_files[train_size + val_size:]
-                
-                # Process training images
-                for img_path in train_files:
-                    # Process and save image
-                    processed_img = preprocess_image(str(img_path), config)
-                    if processed_img:
-                        output_path = train_person_dir / img_path.name
-                        processed_img.save(str(output_path))
-                
-                # Process validation images
-                for img_path in val_files:
-                    processed_img = preprocess_image(str(img_path), config)
-                    if processed_img:
-                        output_path = val_person_dir / img_path.name
-                        processed_img.save(str(output_path))
-                
-                # Process test images
-                for img_path in test_files:
-                    processed_img = preprocess_image(str(img_path), config)
-                    if processed_img:
-                        output_path = test_person_dir / img_path.name
-                        processed_img.save(str(output_path))
-                
-                # Apply augmentation to training set if enabled and there are few images
-                if config.augmentation and len(train_files) < 20:
-                    # Add 5 augmented images for each original image
-                    print(f"Augmenting training data for {person_name}")
-                    
-                    # Get existing processed images
-                    processed_train_files = list(train_person_dir.glob("*.jpg"))
-                    
-                    # Skip if no processed images
-                    if not processed_train_files:
-                        continue
-                    
-                    # Apply augmentation
-                    from PIL import Image
-                    import albumentations as A
-                    
-                    # Define augmentation pipeline
-                    transform = A.Compose([
-                        A.Rotate(limit=config.aug_rotation_range, p=0.7),
-                        A.RandomBrightnessContrast(
-                            brightness_limit=config.aug_brightness_range,
-                            contrast_limit=config.aug_contrast_range,
-                            p=0.7
-                        ),
-                        A.RandomScale(scale_limit=config.aug_scale_range, p=0.5),
-                        A.HorizontalFlip(p=0.5 if config.horizontal_flip else 0),
-                    ])
-                    
-                    for idx, img_path in enumerate(processed_train_files):
-                        # Only augment a subset of images to avoid too many images
-                        if idx >= min(10, len(processed_train_files)):
-                            break
-                            
-                        # Load image
-                        img = Image.open(img_path)
-                        img_array = np.array(img)
-                        
-                        # Create 5 augmented versions
-                        for aug_idx in range(5):
-                            augmented = transform(image=img_array)
-                            aug_img = Image.fromarray(augmented['image'])
-                            
-                            # Save augmented image
-                            aug_path = train_person_dir / f"{img_path.stem}_aug{aug_idx}{img_path.suffix}"
-                            aug_img.save(str(aug_path))
-            
-            print(f"Finished processing {source_name} as {target_name}")
+    # Automatically detect and process each dataset. The datasets don't share
+    # any output, so they're processed side by side in threads - most of the
+    # time goes to cv2/MTCNN work and image I/O, which release the GIL.
+    jobs = [(raw_data_dir / source_name, source_name, target_name)
+            for source_name, target_name in dataset_mapping.items()
+            if (raw_data_dir / source_name).exists()]
+    if jobs:
+        # One seed per dataset, drawn here in a fixed order - the worker threads
+        # can't share the global RNG without their draws interleaving
+        seeds = [random.getrandbits(32) for _ in jobs]
+        with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            futures = [
+                executor.submit(_process_dataset, source_path, source_name, target_name, base_output_dir,
+                                config, test_mode, max_samples_per_class, position, seed)
+                for position, ((source_path, source_name, target_name), seed) in enumerate(zip(jobs, seeds))
+            ]
+            # Re-raise any error from a worker thread
+            for future in futures:
+                future.result()
             
     print("Data preprocessing complete!")
     
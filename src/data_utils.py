@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 
+import os
 import random
+import hashlib
+import pickle
+import tempfile
+import numpy as np
 import torch
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, DataLoader
+from torchvision import datasets, transforms
 from PIL import Image
 from pathlib import Path
 from typing import Optional
 
+from .base_config import PROC_DATA_DIR
+
 class SiameseDataset(Dataset):
     """Dataset for Siamese network training."""
     def __init__(self, root_dir: str, transform=None, test_mode: bool = False, fixed_pairs: bool = False):
@@ -134,4 +142,248 @@ class SiameseDataset(Dataset):
             # Extract identity from parent directory name
             identity = img_path.parent.name
             identities.append(identity)
-        return identities 
\ No newline at end of file
+        return identities 
+
+# (signature, file listing) from earlier ImageFolder scans, keyed by directory
+_IMAGE_FOLDER_SCANS = {}
+
+# Listing saved next to the class folders so later runs can skip the walk too
+_SCAN_CACHE_NAME = ".imagefolder_cache.pkl"
+
+def _folder_stamp(directory):
+    # Adding or removing an image changes its class folder's mtime, so one stat
+    # per class is enough to tell if a saved listing is stale. (Not the root's
+    # own mtime - writing the cache file there changes it.)
+    with os.scandir(directory) as entries:
+        return sorted((e.name, e.stat().st_mtime_ns) for e in entries if e.is_dir())
+
+def _load_saved_scan(directory, signature):
+    try:
+        with open(os.path.join(directory, _SCAN_CACHE_NAME), 'rb') as f:
+            saved_signature, samples = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, ValueError):
+        return None
+    return samples if saved_signature == signature else None
+
+def _save_scan(directory, signature, samples):
+    path = os.path.join(directory, _SCAN_CACHE_NAME)
+    try:
+        with open(path + ".tmp", 'wb') as f:
+            pickle.dump((signature, samples), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        # Read-only dataset, just rescan next time
+        pass
+
+class CachedImageFolder(datasets.ImageFolder):
+    """ImageFolder that reuses the file listing from an earlier scan of the same directory.
+    
+    Listings are kept in memory for this process and saved to a small pickle in
+    the directory; both are reused until a class folder changes. Only the
+    directory walk is cached, so instances can still use different transforms.
+    """
+    @staticmethod
+    def make_dataset(directory, class_to_idx, *args, **kwargs):
+        key = os.fspath(directory)
+        # Any listing, in memory or saved, must match the folder contents and the scan
+        # arguments - the data can be preprocessed again within one session
+        signature = (_folder_stamp(key), sorted(class_to_idx.items()), repr(args), repr(sorted(kwargs.items())))
+        cached = _IMAGE_FOLDER_SCANS.get(key)
+        if cached is not None and cached[0] == signature:
+            return list(cached[1])
+        samples = _load_saved_scan(key, signature)
+        if samples is None:
+            samples = datasets.ImageFolder.make_dataset(directory, class_to_idx, *args, **kwargs)
+            _save_scan(key, signature, samples)
+        _IMAGE_FOLDER_SCANS[key] = (signature, samples)
+        return list(samples)
+
+class DecodedImageDataset(Dataset):
+    """ImageFolder whose images are decoded and resized once, into a uint8 memmap.
+    
+    Returns the same (normalized tensor, label) pairs as ImageFolder with a
+    Resize -> ToTensor -> Normalize transform, but later epochs and folds read
+    the pixels back from the memmap instead of decoding every JPEG again.
+    Only suitable for deterministic transforms (no augmentation).
+    
+    The cache file name hashes the file listing along with each file's size and
+    mtime, so adding, removing or rewriting images (preprocessing again writes
+    the same file names) builds a fresh cache instead of reading a stale one.
+    
+    With normalize=False the raw uint8 images are returned instead, to be
+    normalized after they reach the GPU (see DeviceNormalize).
+    """
+    def __init__(self, root, cache_dir, size: int = 224,
+                 mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225),
+                 num_workers: int = 0, normalize: bool = True):
+        folder = CachedImageFolder(root, transform=transforms.Compose([
+            transforms.Resize((size, size)),
+            transforms.PILToTensor()
+        ]))
+        self.classes = folder.classes
+        self.class_to_idx = folder.class_to_idx
+        self.samples = folder.samples
+        self.targets = folder.targets
+        self.shape = (len(folder), 3, size, size)
+        self.mean = torch.tensor(mean).view(3, 1, 1)
+        self.std = torch.tensor(std).view(3, 1, 1)
+        self.normalize = normalize
+        
+        digest = hashlib.sha1()
+        for path, _ in self.samples:
+            st = os.stat(path)
+            digest.update(f"{path}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+        cache_dir = Path(cache_dir)
+        # open_memmap writes the .npy format, header and all
+        self.cache_path = cache_dir / f"{Path(root).name}_{size}_{digest.hexdigest()[:16]}.npy"
+        if not self.cache_path.exists():
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            self._build_cache(folder, num_workers)
+        
+        # Opened lazily so each DataLoader worker maps the file itself
+        self._images = None
+    
+    def _build_cache(self, folder, num_workers):
+        # Written next to the final name and renamed, so an interrupted run never leaves a partial cache.
+        # The temp name is unique so two processes building the same cache don't write into one file
+        with tempfile.NamedTemporaryFile(dir=self.cache_path.parent, suffix=".tmp", delete=False) as tmp:
+            tmp_path = Path(tmp.name)
+        try:
+            images = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=self.shape)
+            offset = 0
+            for batch, _ in DataLoader(folder, batch_size=64, num_workers=num_workers):
+                images[offset:offset + len(batch)] = batch.numpy()
+                offset += len(batch)
+            images.flush()
+            del images
+            os.replace(tmp_path, self.cache_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        
+        # Caches built from older files are never read again (.u8 is the old name for them)
+        stem = self.cache_path.name.rsplit("_", 1)[0]
+        for pattern in (f"{stem}_*.npy", f"{stem}_*.u8"):
+            for stale in self.cache_path.parent.glob(pattern):
+                if stale != self.cache_path:
+                    stale.unlink(missing_ok=True)
+    
+    def __len__(self):
+        return self.shape[0]
+    
+    def __getitem__(self, idx):
+        if self._images is None:
+            self._images = np.load(self.cache_path, mmap_mode='r')
+        image = torch.from_numpy(np.array(self._images[idx]))
+        if not self.normalize:
+            return image, self.targets[idx]
+        return (image.float().div_(255) - self.mean) / self.std, self.targets[idx]
+    
+    def __getstate__(self):
+        # Don't pickle the mapped array into spawned workers
+        state = self.__dict__.copy()
+        state['_images'] = None
+        return state
+
+class DeviceNormalize:
+    """Normalize uint8 image batches on the device they already live on.
+    
+    Pairs with DecodedImageDataset(normalize=False): the loader moves uint8
+    pixels (a quarter of the float32 bytes) and the scale/normalize runs as one
+    batched op on the GPU instead of per image in the CPU workers.
+    """
+    def __init__(self, device, mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225)):
+        # (x / 255 - mean) / std, folded into a single subtract and divide
+        self.mean = torch.tensor(mean, device=device).view(1, 3, 1, 1) * 255
+        self.std = torch.tensor(std, device=device).view(1, 3, 1, 1) * 255
+    
+    def __call__(self, images):
+        # float() keeps the memory format, so channels_last batches stay NHWC
+        return (images.float() - self.mean) / self.std
+
+def find_processed_datasets(require=("train", "val")):
+    """Find every processed dataset that has all of the required splits.
+    
+    Training needs both train and val, so by default a dataset whose
+    preprocessing stopped before writing val/ isn't offered.
+    
+    Returns a tuple of (path, display_name) pairs so callers can index
+    straight into it after the user picks a number.
+    """
+    def has_splits(path):
+        return all(os.path.isdir(os.path.join(path, split)) for split in require)
+    
+    processed_dirs = []
+    dataset_names = set()  # For deduplication
+    
+    # Check for the standard organization: config_name/dataset_name/<split>
+    # scandir gives us is_dir() from the directory listing, no extra stat per entry
+    with os.scandir(PROC_DATA_DIR) as entries:
+        config_entries = [e for e in entries if e.is_dir() and e.name not in ["train", "val", "test"]]
+    # Plain os.path checks while scanning; only the matches become Path objects
+    for config_entry in config_entries:
+        if has_splits(config_entry.path):
+            # Use this directory with its name
+            if config_entry.name not in dataset_names:
+                processed_dirs.append((Path(config_entry.path), config_entry.name))
+                dataset_names.add(config_entry.name)
+        else:
+            with os.scandir(config_entry.path) as entries:
+                dataset_entries = [e for e in entries if e.is_dir()]
+            for dataset_entry in dataset_entries:
+                if has_splits(dataset_entry.path):
+                    # Use config/dataset naming
+                    dataset_name = f"{config_entry.name}/{dataset_entry.name}"
+                    if dataset_name not in dataset_names:
+                        processed_dirs.append((Path(dataset_entry.path), dataset_name))
+                        dataset_names.add(dataset_name)
+    
+    # Also check for simpler structure where the splits are directly in PROC_DATA_DIR
+    if has_splits(PROC_DATA_DIR):
+        processed_dirs.append((PROC_DATA_DIR, "processed (root)"))
+    
+    return tuple(processed_dirs)
+
+def _to_device(t, device, memory_format, non_blocking=False):
+    # memory_format only applies to image batches, not labels
+    if t.dim() == 4:
+        return t.to(device, non_blocking=non_blocking, memory_format=memory_format)
+    return t.to(device, non_blocking=non_blocking)
+
+def prefetch_to_device(loader, device, memory_format=torch.preserve_format):
+    """Yield the loader's batches already moved to device.
+    
+    On CUDA the next batch is copied on a side stream while the caller is
+    still working on the current one, so the transfer overlaps the forward
+    pass instead of queueing in front of it. Works best with pin_memory=True.
+    Image batches are converted to memory_format on the way.
+    """
+    if device.type != 'cuda':
+        for batch in loader:
+            yield [_to_device(t, device, memory_format) for t in batch]
+        return
+    
+    copy_stream = torch.cuda.Stream(device)
+    
+    def _copy(batch):
+        with torch.cuda.stream(copy_stream):
+            return [_to_device(t, device, memory_format, non_blocking=True) for t in batch]
+    
+    def _ready(batch):
+        # Wait for the copy, and tell the allocator the tensors are now used on the compute stream
+        compute_stream = torch.cuda.current_stream(device)
+        compute_stream.wait_stream(copy_stream)
+        for t in batch:
+            t.record_stream(compute_stream)
+        return batch
+    
+    batches = iter(loader)
+    try:
+        next_batch = _copy(next(batches))
+    except StopIteration:
+        return
+    for batch in batches:
+        current = _ready(next_batch)
+        next_batch = _copy(batch)
+        yield current
+    yield _ready(next_batch)
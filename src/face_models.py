@@ -11,6 +11,10 @@ import math  # For kaiming initialization
 # List of supported model types
 MODEL_TYPES = ['baseline', 'cnn', 'siamese', 'attention', 'arcface', 'hybrid', 'ensemble']
 
+# Models that can take channels_last (NHWC) input. The others .view() a
+# multi-pixel conv feature map, which only works on contiguous NCHW tensors
+CHANNELS_LAST_MODEL_TYPES = ('baseline', 'cnn', 'arcface')
+
 
 
 class BaselineNet(nn.Module):
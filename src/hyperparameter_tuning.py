@@ -15,17 +15,18 @@ from torch.cuda.amp import autocast, GradScaler  # For mixed precision training
 from pathlib import Path
 from typing import Dict, Any, List, Optional, Union, Tuple
 from torch.utils.data import DataLoader
-from torchvision import datasets, transforms
+from torchvision import transforms
 import torch.nn as nn
 import torch.nn.functional as F
 from datetime import datetime
 import logging
 from tqdm.auto import tqdm  # For progress bars
 
-from .base_config import PROC_DATA_DIR, CHECKPOINTS_DIR, logger, OUT_DIR
+from .base_config import CHECKPOINTS_DIR, logger, OUT_DIR, save_json
 from .face_models import get_model, get_criterion, ArcMarginProduct
-from .data_utils import SiameseDataset
+from .data_utils import SiameseDataset, CachedImageFolder, find_processed_datasets
 from .lr_finder import LearningRateFinder
+from .training import train_model
 import inspect
 
 # Setup logging
@@ -219,7 +220,7 @@ def find_optimal_lr_for_trial(model_type: str, dataset_path: Path, batch_size: i
         train_dataset = SiameseDataset(str(dataset_path / "train"), transform=transform)
         num_classes = 2
     else:
-        train_dataset = datasets.ImageFolder(dataset_path / "train", transform=transform)
+        train_dataset = CachedImageFolder(dataset_path / "train", transform=transform)
         num_classes = len(train_dataset.classes)
     
     train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
@@ -300,7 +301,10 @@ def run_hyperparameter_tuning(model_type: Optional[str] = None,
                              use_early_stopping: bool = True,
                              early_stopping_patience: Optional[int] = None,
                              max_cpu_threads: Optional[int] = None,
-                             use_mixed_precision: bool = True) -> Optional[Dict[str, Any]]:
+                             use_mixed_precision: bool = True,
+                             n_jobs: int = 1,
+                             storage: Optional[str] = None,
+                             study_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """Run the hyperparameter tuning process with user-friendly progress bar.
     
     Args:
@@ -324,10 +328,24 @@ def run_hyperparameter_tuning(model_type: Optional[str] = None,
         early_stopping_patience: Number of epochs to wait before early stopping (default: auto-calculated)
         max_cpu_threads: Maximum number of CPU threads to use (default: auto-detected)
         use_mixed_precision: Whether to use mixed precision training for faster performance (default: True)
+        n_jobs: Only 1 is supported. Optuna runs n_jobs > 1 as threads, but each
+            trial changes process-wide state (torch threads and cuDNN flags,
+            logging handlers, the metrics CSV). For parallel trials run several
+            processes with the same storage and study_name instead.
+        storage: Optuna storage URL shared between workers, e.g. an RDB URL.
+            Several processes pointed at the same storage and study_name
+            split the trials between them. Defaults to a per-run SQLite file.
+        study_name: Name of the study in the shared storage (default: model_dataset)
         
     Returns:
         Best parameters and results, or None if it fails
     """
+    if n_jobs != 1:
+        logger.warning(f"n_jobs={n_jobs} isn't supported: trials would share torch's global settings, "
+                       "the log handlers and the metrics CSV. Running one trial at a time - for parallel "
+                       "trials start several workers with the same --storage and --study-name")
+        n_jobs = 1
+    
     # Optimize CPU and GPU usage
     used_threads = limit_cpu_threads(max_cpu_threads)
     logger.info(f"CPU threads limited to {used_threads} for better parallelism")
@@ -353,41 +371,21 @@ def run_hyperparameter_tuning(model_type: Optional[str] = None,
     
     if dataset_path is None:
         # List available processed datasets
-        processed_dirs = []
-        dataset_names = set()  # For deduplication
-        
-        # Check for the standard organization: config_name/dataset_name/train
-        config_dirs = [d for d in PROC_DATA_DIR.iterdir() if d.is_dir() and not d.name in ["train", "val", "test"]]
-        for config_dir in config_dirs:
-            if (config_dir / "train").exists():
-                # Use this directory with its name
-                if config_dir.name not in dataset_names:
-                    processed_dirs.append((config_dir, config_dir.name))
-                    dataset_names.add(config_dir.name)
-            else:
-                for dataset_dir in config_dir.iterdir():
-                    if dataset_dir.is_dir() and (dataset_dir / "train").exists():
-                        # Use config/dataset naming
-                        dataset_name = f"{config_dir.name}/{dataset_dir.name}"
-                        if dataset_name not in dataset_names:
-                            processed_dirs.append((dataset_dir, dataset_name))
-                            dataset_names.add(dataset_name)
-        
-        # Also check for simpler structure where train is directly in PROC_DATA_DIR
-        if (PROC_DATA_DIR / "train").exists() and (PROC_DATA_DIR / "val").exists():
-            if "root" not in dataset_names:
-                processed_dirs.append((PROC_DATA_DIR, "processed (root)"))
-                dataset_names.add("root")
+        processed_dirs = find_processed_datasets()
         
         if not processed_dirs:
             print("No processed datasets found. Please process raw data first.")
             return None
         
-        print("\nAvailable processed datasets:")
-        for i, (dir_path, display_name) in enumerate(processed_dirs, 1):
-            print(f"{i}. {display_name}")
+        # Nothing to choose between if there's only one dataset
+        if len(processed_dirs) == 1:
+            dataset_path, display_name = processed_dirs[0]
+            print(f"\nUsing only available dataset: {display_name}")
+        else:
+            print("\nAvailable processed datasets:")
+            print("\n".join(f"{i}. {display_name}" for i, (_, display_name) in enumerate(processed_dirs, 1)))
         
-        while True:
+        while dataset_path is None:
             dataset_choice = input("\nEnter dataset number to use for hyperparameter tuning: ")
             try:
                 dataset_idx = int(dataset_choice) - 1
@@ -420,8 +418,10 @@ def run_hyperparameter_tuning(model_type: Optional[str] = None,
     logger.info(f"Keeping only {keep_checkpoints} best checkpoint(s) per trial to save storage")
     
     # Create and run the Optuna study
-    study_name = f"{model_type}_{dataset_path.name}"
-    storage_name = f"sqlite:///{hyperopt_output_dir}/study.db"
+    # A shared storage lets other workers join this study with load_if_exists
+    study_name = study_name or f"{model_type}_{dataset_path.name}"
+    study_db = hyperopt_output_dir / "study.db"
+    storage_name = storage or f"sqlite:///{study_db}"
     
     try:
         # Try to continue from existing study
@@ -434,9 +434,12 @@ def run_hyperparameter_tuning(model_type: Optional[str] = None,
         logger.info(f"Continuing existing study with {len(study.trials)} previous trials")
     except:
         # Create new study if loading fails
+        # Never wipe a shared storage - other workers may be using it
+        if storage is not None:
+            raise
         try:
-            if Path(storage_name.replace("sqlite:///", "")).exists():
-                Path(storage_name.replace("sqlite:///", "")).unlink()
+            if study_db.exists():
+                study_db.unlink()
         except:
             pass
         
@@ -455,6 +458,8 @@ def run_hyperparameter_tuning(model_type: Optional[str] = None,
     print(f"Using dataset: {dataset_path.name}")
     print(f"Trial-0 baseline: {'Enabled' if use_trial0_baseline else 'Disabled'}")
     print(f"LR Finder: {'Enabled' if use_lr_finder else 'Disabled'}")
+    if storage is not None:
+        print(f"Shared study '{study_name}' in {storage}")
     
     # Create CSV file for logging all metrics
     metrics_csv_path = hyperopt_output_dir / "hyperopt_metrics.csv"
@@ -475,6 +480,13 @@ def run_hyperparameter_tuning(model_type: Optional[str] = None,
             "state": trial.state.name
         })
     
+    # Hand the finished trial's cached GPU blocks back before the next model is
+    # built. Optuna's gc_after_trial has already dropped the model by now (a
+    # pruned trial's traceback would otherwise keep it alive).
+    def release_gpu_memory(study, trial):
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    
     # Run optimization with progress tracking
     study.optimize(
         lambda trial: objective(trial, model_type, dataset_path, use_trial0_baseline, use_lr_finder, 
@@ -482,7 +494,9 @@ def run_hyperparameter_tuning(model_type: Optional[str] = None,
                                early_stopping_patience, lr_finder_iterations, metrics_csv_path),
         n_trials=n_trials,
         timeout=timeout,
-        callbacks=[progress_callback]
+        n_jobs=n_jobs,
+        gc_after_trial=True,
+        callbacks=[release_gpu_memory, progress_callback]
     )
     
     # Close the progress bar
@@ -512,8 +526,7 @@ def run_hyperparameter_tuning(model_type: Optional[str] = None,
     }
     
     # Save results
-    with open(hyperopt_output_dir / 'hyperopt_results.json', 'w') as f:
-        json.dump(hyperopt_final_results, f, indent=2)
+    save_json(hyperopt_final_results, hyperopt_output_dir / 'hyperopt_results.json')
     
     # Save study summary
     with open(hyperopt_output_dir / 'study_summary.txt', 'w') as f:
@@ -530,8 +543,6 @@ def run_hyperparameter_tuning(model_type: Optional[str] = None,
     
     # Ask if user wants to train a model with these parameters
     if input("\nTrain a model with these parameters? (y/n): ").lower() == 'y':
-        from .training import train_model
-        
         # Create a good model name
         model_name = f"{model_type}_tuned_{dataset_path.name}"
         
@@ -765,13 +776,13 @@ def objective(trial: optuna.Trial, model_type: str, dataset_path: Path,
         transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
     ])
     
-    # Load datasets
+    # Load datasets (the directory scans are shared between trials)
     if model_type == 'siamese':
         train_dataset = SiameseDataset(dataset_path / "train", transform=transform)
         val_dataset = SiameseDataset(dataset_path / "val", transform=transform)
     else:
-        train_dataset = datasets.ImageFolder(dataset_path / "train", transform=transform)
-        val_dataset = datasets.ImageFolder(dataset_path / "val", transform=transform)
+        train_dataset = CachedImageFolder(dataset_path / "train", transform=transform)
+        val_dataset = CachedImageFolder(dataset_path / "val", transform=transform)
     
     # Optimize DataLoader for better performance
     # Increase num_workers based on CPU cores available, use prefetch factor for memory efficiency
@@ -1018,8 +1029,10 @@ def objective(trial: optuna.Trial, model_type: str, dataset_path: Path,
                 
         # Validation phase
         model.eval()
-        val_loss = 0.0
-        val_correct = 0
+        # Loss and correct counts are summed on the device and read back once per
+        # epoch, instead of two .item() syncs per batch
+        val_loss_sum = torch.zeros((), device=device)
+        val_correct_sum = torch.zeros((), dtype=torch.long, device=device)
         val_total = 0
         val_batch_count = 0  # Track number of batches for proper loss averaging
         
@@ -1069,14 +1082,15 @@ def objective(trial: optuna.Trial, model_type: str, dataset_path: Path,
                     loss = criterion(outputs, targets)
                 
                 # Cap validation loss at reasonable values for reporting
-                capped_loss = min(loss.item(), 10.0)
-                val_loss += capped_loss
+                val_loss_sum += loss.detach().float().clamp(max=10.0)
                 val_batch_count += 1
                 
-                _, predicted = outputs.max(1)
+                predicted = outputs.argmax(dim=1)
                 val_total += targets.size(0)
-                val_correct += predicted.eq(targets).sum().item()
+                val_correct_sum += predicted.eq(targets).sum()
         
+        val_loss = val_loss_sum.item()
+        val_correct = val_correct_sum.item()
         val_acc = val_correct / val_total
         # Calculate average validation loss
         avg_val_loss = val_loss / val_batch_count if val_batch_count > 0 else 0.0
@@ -1154,7 +1168,6 @@ def limit_cpu_threads(max_threads: Optional[int] = None):
     
     # Also set OpenMP thread limits if possible
     try:
-        import os
         os.environ["OMP_NUM_THREADS"] = str(max_threads)
         os.environ["MKL_NUM_THREADS"] = str(max_threads)
     except:
@@ -16,12 +16,13 @@ from .base_config import (
 
 # Added import for use below
 import os
-from .data_prep import get_preprocessing_config, process_raw_data, PreprocessingConfig, visualize_preprocessing_steps
+from .data_prep import get_preprocessing_config, process_raw_data, PreprocessingConfig, visualize_preprocessing_steps, list_image_files
 from .training import train_model
 from .testing import evaluate_model, predict_image
 from .face_models import get_model
 from .hyperparameter_tuning import run_hyperparameter_tuning, MODEL_TYPES
 from .cross_validation import run_cross_validation
+from .data_utils import find_processed_datasets
 from . import download_dataset
 
 # Get path to the downloader script
@@ -215,7 +216,7 @@ def interactive_menu():
                         print("Please enter a valid number.")
             
             # Get images for the selected person
-            image_files = list(selected_person.glob("*.jpg")) + list(selected_person.glob("*.png")) + list(selected_person.glob("*.jpeg"))
+            image_files = list_image_files(selected_person)
             if not image_files:
                 print(f"No images found for {selected_person.name}")
                 continue
@@ -263,31 +264,7 @@ def interactive_menu():
                 continue
             
             # List available processed datasets
-            processed_dirs = []
-            dataset_names = set()  # For deduplication
-            
-            # Check for the standard organization: config_name/dataset_name/train
-            config_dirs = [d for d in PROC_DATA_DIR.iterdir() if d.is_dir() and not d.name in ["train", "val", "test"]]
-            for config_dir in config_dirs:
-                if (config_dir / "train").exists():
-                    # Use this directory with its name
-                    if config_dir.name not in dataset_names:
-                        processed_dirs.append((config_dir, config_dir.name))
-                        dataset_names.add(config_dir.name)
-                else:
-                    for dataset_dir in config_dir.iterdir():
-                        if dataset_dir.is_dir() and (dataset_dir / "train").exists():
-                            # Use config/dataset naming
-                            dataset_path = f"{config_dir.name}/{dataset_dir.name}"
-                            if dataset_path not in dataset_names:
-                                processed_dirs.append((dataset_dir, dataset_path))
-                                dataset_names.add(dataset_path)
-            
-            # Also check for simpler structure where train is directly in PROC_DATA_DIR
-            if (PROC_DATA_DIR / "train").exists() and (PROC_DATA_DIR / "val").exists():
-                if "root" not in dataset_names:
-                    processed_dirs.append((PROC_DATA_DIR, "processed (root)"))
-                    dataset_names.add("root")
+            processed_dirs = find_processed_datasets()
             
             if not processed_dirs:
                 print("No processed datasets found. Please process raw data first.")
@@ -500,47 +477,27 @@ def interactive_menu():
                 continue
             
             # List available processed datasets
-            processed_dirs = []
-            dataset_names = set()  # For deduplication
-            
-            # Check for the standard organization: config_name/dataset_name/train
-            config_dirs = [d for d in PROC_DATA_DIR.iterdir() if d.is_dir() and not d.name in ["train", "val", "test"]]
-            for config_dir in config_dirs:
-                if (config_dir / "train").exists():
-                    # Use this directory with its name
-                    if config_dir.name not in dataset_names:
-                        processed_dirs.append((config_dir, config_dir.name))
-                        dataset_names.add(config_dir.name)
-                else:
-                    for dataset_dir in config_dir.iterdir():
-                        if dataset_dir.is_dir() and (dataset_dir / "train").exists():
-                            # Use config/dataset naming
-                            dataset_name = f"{config_dir.name}/{dataset_dir.name}"
-                            if dataset_name not in dataset_names:
-                                processed_dirs.append((dataset_dir, dataset_name))
-                                dataset_names.add(dataset_name)
-            
-            # Also check for simpler structure where train is directly in PROC_DATA_DIR
-            if (PROC_DATA_DIR / "train").exists() and (PROC_DATA_DIR / "val").exists():
-                if "root" not in dataset_names:
-                    processed_dirs.append((PROC_DATA_DIR, "processed (root)"))
-                    dataset_names.add("root")
+            processed_dirs = find_processed_datasets()
             
             if not processed_dirs:
                 print("No processed datasets found. Please process raw data first.")
                 continue
             
-            print("\nAvailable processed datasets:")
-            for i, (dir_path, display_name) in enumerate(processed_dirs, 1):
-                print(f"{i}. {display_name}")
-            
             selected_data_dir = None
-            while True:
+            # Nothing to choose between if there's only one dataset
+            if len(processed_dirs) == 1:
+                selected_data_dir, display_name = processed_dirs[0]
+                print(f"\nUsing only available dataset: {display_name}")
+            else:
+                print("\nAvailable processed datasets:")
+                print("\n".join(f"{i}. {display_name}" for i, (_, display_name) in enumerate(processed_dirs, 1)))
+            
+            while selected_data_dir is None:
                 dataset_choice = input("\nEnter dataset number to use for tuning: ")
                 try:
                     dataset_idx = int(dataset_choice) - 1
                     if 0 <= dataset_idx < len(processed_dirs):
-                        selected_data_dir = processed_dirs[dataset_idx][0]  # Get the path part
+                        selected_data_dir, _ = processed_dirs[dataset_idx]
                         break
                     else:
                         print("Invalid choice. Please try again.")
@@ -769,31 +726,7 @@ def interactive_menu():
                         print("Please enter a valid number.")
                 
             # List available processed datasets
-            processed_dirs = []
-            dataset_names = set()  # For deduplication
-            
-            # Check for the standard organization: config_name/dataset_name/train
-            config_dirs = [d for d in PROC_DATA_DIR.iterdir() if d.is_dir() and not d.name in ["train", "val", "test"]]
-            for config_dir in config_dirs:
-                if (config_dir / "train").exists():
-                    # Use this directory with its name
-                    if config_dir.name not in dataset_names:
-                        processed_dirs.append((config_dir, config_dir.name))
-                        dataset_names.add(config_dir.name)
-                else:
-                    for dataset_dir in config_dir.iterdir():
-                        if dataset_dir.is_dir() and (dataset_dir / "train").exists():
-                            # Use config/dataset naming
-                            dataset_path = f"{config_dir.name}/{dataset_dir.name}"
-                            if dataset_path not in dataset_names:
-                                processed_dirs.append((dataset_dir, dataset_path))
-                                dataset_names.add(dataset_path)
-            
-            # Also check for simpler structure where train is directly in PROC_DATA_DIR
-            if (PROC_DATA_DIR / "train").exists() and (PROC_DATA_DIR / "val").exists():
-                if "root" not in dataset_names:
-                    processed_dirs.append((PROC_DATA_DIR, "processed (root)"))
-                    dataset_names.add("root")
+            processed_dirs = find_processed_datasets()
             
             if not processed_dirs:
                 print("No processed datasets found. Please process raw data first.")
@@ -809,7 +742,7 @@ def interactive_menu():
                 try:
                     dataset_idx = int(dataset_choice) - 1
                     if 0 <= dataset_idx < len(processed_dirs):
-                        selected_data_dir = processed_dirs[dataset_idx][0]  # Get the path part
+                        selected_data_dir, _ = processed_dirs[dataset_idx]
                         break
                     else:
                         print("Invalid choice. Please try again.")
@@ -833,31 +766,7 @@ def interactive_menu():
             print("\nCompare All Models")
             
             # List available processed datasets
-            processed_dirs = []
-            dataset_names = set()  # For deduplication
-            
-            # Check for the standard organization: config_name/dataset_name/train
-            config_dirs = [d for d in PROC_DATA_DIR.iterdir() if d.is_dir() and not d.name in ["train", "val", "test"]]
-            for config_dir in config_dirs:
-                if (config_dir / "train").exists():
-                    # Use this directory with its name
-                    if config_dir.name not in dataset_names:
-                        processed_dirs.append((config_dir, config_dir.name))
-                        dataset_names.add(config_dir.name)
-                else:
-                    for dataset_dir in config_dir.iterdir():
-                        if dataset_dir.is_dir() and (dataset_dir / "train").exists():
-                            # Use config/dataset naming
-                            dataset_path = f"{config_dir.name}/{dataset_dir.name}"
-                            if dataset_path not in dataset_names:
-                                processed_dirs.append((dataset_dir, dataset_path))
-                                dataset_names.add(dataset_path)
-            
-            # Also check for simpler structure where train is directly in PROC_DATA_DIR
-            if (PROC_DATA_DIR / "train").exists() and (PROC_DATA_DIR / "val").exists():
-                if "root" not in dataset_names:
-                    processed_dirs.append((PROC_DATA_DIR, "processed (root)"))
-                    dataset_names.add("root")
+            processed_dirs = find_processed_datasets()
             
             if not processed_dirs:
                 print("No processed datasets found. Please process raw data first.")
@@ -873,8 +782,7 @@ def interactive_menu():
                 try:
                     dataset_idx = int(dataset_choice) - 1
                     if 0 <= dataset_idx < len(processed_dirs):
-                        selected_data_dir = processed_dirs[dataset_idx][0]  # Get the path part
-                        selected_dataset_name = processed_dirs[dataset_idx][1]  # Get the display name
+                        selected_data_dir, selected_dataset_name = processed_dirs[dataset_idx]
                         break
                     else:
                         print("Invalid choice. Please try again.")
@@ -1,71 +1,220 @@
 #!/usr/bin/env python3
 
 import argparse
+import heapq
+import os
 import sys
-import torch
 from pathlib import Path
 
 from .base_config import logger, CHECKPOINTS_DIR
-from .data_prep import get_preprocessing_config, process_raw_data
-from .training import train_model
-from .testing import evaluate_model, predict_image
-from .face_models import get_model
-from .interactive import interactive_menu
 
-def main():
-    """Main entry point for face recognition system.
-    Simplified version with only essential components.
-    """
-    parser = argparse.ArgumentParser(description='Face Recognition System - Simplified')
-    subparsers = parser.add_subparsers(dest='cmd', help='Command to run')
-    
-    # Interactive command 
-    subparsers.add_parser('interactive', help='Run the interactive menu interface')
-    
-    # Demo command
-    subparsers.add_parser('demo', help='Run live demo app')
-    
-    # CV command
-    subparsers.add_parser('cv', help='Run cross-validation')
-    
-    # Hyperopt command
-    subparsers.add_parser('hyperopt', help='Run hyperparameter tuning')
-    
-    # Preprocess command
+# Same list as face_models.MODEL_TYPES, repeated here so building the
+# parser doesn't have to import face_models and torchvision (torch itself
+# already comes in through base_config). Siamese can't do single-image predict.
+_MODEL_TYPES = ('baseline', 'cnn', 'siamese', 'attention', 'arcface', 'hybrid', 'ensemble')
+_PRED_MODEL_TYPES = tuple(t for t in _MODEL_TYPES if t != 'siamese')
+
+def _add_hyperopt_parser(subparsers):
+    hyperopt_p = subparsers.add_parser('hyperopt', help='Run hyperparameter tuning')
+    hyperopt_p.add_argument('--model-type', type=str, choices=_MODEL_TYPES,
+                            help='Type of model to tune (prompted for if omitted)')
+    hyperopt_p.add_argument('--dataset', type=str,
+                            help='Path to the processed dataset directory (prompted for if omitted)')
+
+def _add_preprocess_parser(subparsers):
     preproc = subparsers.add_parser('preprocess', help='Preprocess raw data')
     preproc.add_argument('--test', action='store_true', help='Run in test mode with limited data')
-    
-    # Train command
+
+def _add_train_parser(subparsers):
     train_p = subparsers.add_parser('train', help='Train a model')
     train_p.add_argument('--model-type', type=str, required=True, 
-                            choices=['baseline', 'cnn', 'siamese', 'attention', 'arcface', 'hybrid', 'ensemble'],
+                            choices=_MODEL_TYPES,
                             help='Type of model to train')
     train_p.add_argument('--model-name', type=str, help='Name for the trained model')
     train_p.add_argument('--batch-size', type=int, default=32, help='Batch size for training')
     train_p.add_argument('--epochs', type=int, default=50, help='Number of epochs')
     train_p.add_argument('--lr', type=float, default=0.001, help='Learning rate')
     train_p.add_argument('--weight-decay', type=float, default=1e-4, help='Weight decay')
-    
-    # Evaluate command
+
+def _add_evaluate_parser(subparsers):
     eval_p = subparsers.add_parser('evaluate', help='Evaluate a model')
     eval_p.add_argument('--model-type', type=str, required=True, 
-                           choices=['baseline', 'cnn', 'siamese', 'attention', 'arcface', 'hybrid', 'ensemble'],
+                           choices=_MODEL_TYPES,
                            help='Type of model to evaluate')
     eval_p.add_argument('--model-name', type=str, help='Name of the model to evaluate')
-    
-    # Predict command
+
+def _add_predict_parser(subparsers):
     pred_p = subparsers.add_parser('predict', help='Predict on a single image')
     pred_p.add_argument('--model-type', type=str, required=True, 
-                              choices=['baseline', 'cnn', 'attention', 'arcface', 'hybrid', 'ensemble'],
+                              choices=_PRED_MODEL_TYPES,
                               help='Type of model to use (not siamese)')
     pred_p.add_argument('--model-name', type=str, help='Name of the model to use')
     pred_p.add_argument('--image-path', type=str, required=True, help='Path to the image to predict')
+
+def _add_list_models_parser(subparsers):
+    list_p = subparsers.add_parser('list-models', help='List available trained models')
+    list_p.add_argument('--limit', type=int, help='Only show the first N models (alphabetical)')
+    list_p.add_argument('--format', choices=['text', 'json'], default='text',
+                        help='Output format (json is easier for scripts to consume)')
+
+# Each command gets its own builder so main() only has to set up the one
+# that is actually being run. Order here is the order shown in --help.
+COMMAND_BUILDERS = {
+    'interactive': lambda sp: sp.add_parser('interactive', help='Run the interactive menu interface'),
+    'demo': lambda sp: sp.add_parser('demo', help='Run live demo app'),
+    'cv': lambda sp: sp.add_parser('cv', help='Run cross-validation'),
+    'hyperopt': _add_hyperopt_parser,
+    'preprocess': _add_preprocess_parser,
+    'train': _add_train_parser,
+    'evaluate': _add_evaluate_parser,
+    'predict': _add_predict_parser,
+    'check-gpu': lambda sp: sp.add_parser('check-gpu', help='Check GPU availability'),
+    'list-models': _add_list_models_parser,
+}
+
+# Command handlers. Heavy modules (torch, training, testing...) are
+# imported inside each one so a command only pays for what it uses.
+def _cmd_interactive(args):
+    from .interactive import interactive_menu
+    return interactive_menu()
+
+def _cmd_demo(args):
+    # Run the live demo
+    from .app import main as run_app
+    return run_app()
+
+def _cmd_cv(args):
+    from .cross_validation import run_cross_validation
+    run_cross_validation()
+    return 0
+
+def _cmd_hyperopt(args):
+    from .hyperparameter_tuning import run_hyperparameter_tuning
+    dataset_path = None
+    if args.dataset:
+        dataset_path = Path(args.dataset)
+        if not dataset_path.exists():
+            print(f"Error: Dataset path {dataset_path} does not exist")
+            return 1
+    run_hyperparameter_tuning(model_type=args.model_type, dataset_path=dataset_path)
+    return 0
+
+def _cmd_preprocess(args):
+    from .data_prep import get_preprocessing_config, process_raw_data
+    from .base_config import RAW_DATA_DIR, PROC_DATA_DIR
+    config = get_preprocessing_config()
+    process_raw_data(RAW_DATA_DIR, PROC_DATA_DIR, config=config, test_mode=args.test)
+    return 0
+
+def _cmd_train(args):
+    from .training import train_model
+    train_model(
+        model_type=args.model_type,
+        model_name=args.model_name,
+        batch_size=args.batch_size,
+        epochs=args.epochs,
+        lr=args.lr,
+        weight_decay=args.weight_decay
+    )
+    return 0
+
+def _cmd_evaluate(args):
+    from .testing import evaluate_model
+    evaluate_model(
+        model_type=args.model_type,
+        model_name=args.model_name
+    )
+    return 0
+
+def _cmd_predict(args):
+    from .testing import predict_image
+    name, conf = predict_image(
+        model_type=args.model_type,
+        image_path=args.image_path,
+        model_name=args.model_name
+    )
+    print(f"Prediction: {name} (confidence: {conf:.2f})")
+    return 0
+
+def _cmd_check_gpu(args):
+    import torch
+    print("GPU availability:")
+    print(f"  CUDA available: {torch.cuda.is_available()}")
+    if torch.cuda.is_available():
+        print(f"  Number of GPUs: {torch.cuda.device_count()}")
+        print(f"  Current device: {torch.cuda.current_device()}")
+        print(f"  Device name: {torch.cuda.get_device_name(0)}")
+    return 0
+
+def _cmd_list_models(args):
+    # List trained models in checkpoints directory
+    # One scandir pass - DirEntry.is_dir() comes from the listing itself
+    with os.scandir(CHECKPOINTS_DIR) as entries:
+        model_names = (
+            entry.name for entry in entries
+            if entry.is_dir(follow_symlinks=False) and os.path.isfile(os.path.join(entry.path, 'best_model.pth'))
+        )
+        # With a limit we only need the first N names, no need to sort them all
+        if args.limit is not None:
+            model_names = heapq.nsmallest(args.limit, model_names)
+        else:
+            model_names = sorted(model_names)
+    
+    if args.format == 'json':
+        payload = {'models': model_names}
+        # orjson is optional, it's just faster than the stdlib json
+        try:
+            import orjson
+            sys.stdout.buffer.write(orjson.dumps(payload, option=orjson.OPT_APPEND_NEWLINE))
+            sys.stdout.flush()
+        except ImportError:
+            import json
+            print(json.dumps(payload))
+        return 0
+    
+    if not model_names:
+        print("No trained models found.")
+        return 0
+    
+    print("\nAvailable trained models:")
+    print("\n".join(f"  {name}" for name in model_names))
+    return 0
+
+COMMANDS = {
+    'interactive': _cmd_interactive,
+    'demo': _cmd_demo,
+    'cv': _cmd_cv,
+    'hyperopt': _cmd_hyperopt,
+    'preprocess': _cmd_preprocess,
+    'train': _cmd_train,
+    'evaluate': _cmd_evaluate,
+    'predict': _cmd_predict,
+    'check-gpu': _cmd_check_gpu,
+    'list-models': _cmd_list_models,
+}
+
+# Subcommands without any options of their own
+_NO_OPTION_COMMANDS = ('interactive', 'demo', 'cv', 'check-gpu')
+
+def main():
+    """Main entry point for face recognition system.
+    Simplified version with only essential components.
+    """
+    # Commands that take no options don't need a parser at all
+    if len(sys.argv) == 2 and sys.argv[1] in _NO_OPTION_COMMANDS:
+        return COMMANDS[sys.argv[1]](argparse.Namespace(cmd=sys.argv[1]))
     
-    # Check GPU command
-    subparsers.add_parser('check-gpu', help='Check GPU availability')
+    parser = argparse.ArgumentParser(description='Face Recognition System - Simplified')
+    subparsers = parser.add_subparsers(dest='cmd', help='Command to run')
     
-    # List models command
-    list_models_p = subparsers.add_parser('list-models', help='List available trained models')
+    # Only build the subparser for the command being run. For --help, no
+    # command, or a typo we build all of them so argparse can list choices.
+    cmd = sys.argv[1] if len(sys.argv) > 1 else None
+    if cmd in COMMAND_BUILDERS:
+        COMMAND_BUILDERS[cmd](subparsers)
+    else:
+        for build in COMMAND_BUILDERS.values():
+            build(subparsers)
     
     args = parser.parse_args()
     
@@ -74,76 +223,7 @@ def main():
         parser.print_help()
         return 1
     
-    # Execute the appropriate command
-    if args.cmd == 'interactive':
-        return interactive_menu()
-    
-    elif args.cmd == 'demo':
-        # Run the live demo
-        from .app import main as run_app
-        return run_app()
-    
-    elif args.cmd == 'cv':
-        # Run cross-validation
-        from .cross_validation import run_cross_validation
-        run_cross_validation()
-    
-    elif args.cmd == 'hyperopt':
-        # Run hyperparameter tuning
-        from .hyperparameter_tuning import run_hyperparameter_tuning
-        run_hyperparameter_tuning()
-    
-    elif args.cmd == 'preprocess':
-        config = get_preprocessing_config()
-        from .base_config import RAW_DATA_DIR, PROC_DATA_DIR
-        process_raw_data(RAW_DATA_DIR, PROC_DATA_DIR, config=config, test_mode=args.test)
-    
-    elif args.cmd == 'train':
-        train_model(
-            model_type=args.model_type,
-            model_name=args.model_name,
-            batch_size=args.batch_size,
-            epochs=args.epochs,
-            lr=args.lr,
-            weight_decay=args.weight_decay
-        )
-    
-    elif args.cmd == 'evaluate':
-        metrics = evaluate_model(
-            model_type=args.model_type,
-            model_name=args.model_name
-        )
-    
-    elif args.cmd == 'predict':
-        name, conf = predict_image(
-            model_type=args.model_type,
-            image_path=args.image_path,
-            model_name=args.model_name
-        )
-        print(f"Prediction: {name} (confidence: {conf:.2f})")
-    
-    elif args.cmd == 'check-gpu':
-        print("GPU availability:")
-        print(f"  CUDA available: {torch.cuda.is_available()}")
-        if torch.cuda.is_available():
-            print(f"  Number of GPUs: {torch.cuda.device_count()}")
-            print(f"  Current device: {torch.cuda.current_device()}")
-            print(f"  Device name: {torch.cuda.get_device_name(0)}")
-    
-    elif args.cmd == 'list-models':
-        # List trained models in checkpoints directory
-        model_dirs = list(CHECKPOINTS_DIR.glob('*'))
-        if not model_dirs:
-            print("No trained models found.")
-            return 0
-        
-        print("\nAvailable trained models:")
-        for model_dir in sorted(model_dirs):
-            model_path = model_dir / 'best_model.pth'
-            if model_path.exists():
-                print(f"  {model_dir.name}")
-    
-    return 0
+    return COMMANDS[args.cmd](args)
 
 if __name__ == '__main__':
     sys.exit(main()) 
\ No newline at end of file
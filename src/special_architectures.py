@@ -7,6 +7,9 @@ special handling like Siamese networks and ArcFace.
 """
 
 import os
+import json
+import time
+import traceback
 import torch
 import torch.nn as nn
 import torch.optim as optim
@@ -18,7 +21,7 @@ from typing import Dict, List, Tuple, Optional, Any
 
 from .face_models import get_model, get_criterion
 from .base_config import logger
-from .training_utils import apply_gradient_clipping, save_checkpoint
+from .training_utils import apply_gradient_clipping, save_checkpoint, get_scheduler, EarlyStopping, find_latest_checkpoint
 from .advanced_metrics import create_enhanced_confusion_matrix, calculate_per_class_metrics, expected_calibration_error
 
 class ArcFaceTrainer:
@@ -42,9 +45,6 @@ class ArcFaceTrainer:
     
     def test(self, test_dataset):
         """Test the ArcFace model on the provided test dataset."""
-        from torch.utils.data import DataLoader
-        import torch
-        
         # Create test dataloader with appropriate transforms
         test_dataloader = DataLoader(test_dataset, batch_size=self.config.batch_size, shuffle=False)
         device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -64,7 +64,6 @@ class ArcFaceTrainer:
             y_score = test_result.get('y_score', [])
             
             # Convert to numpy arrays
-            import numpy as np
             y_true = np.array(y_true)
             y_pred = np.array(y_pred)
             y_score = np.array(y_score)
@@ -98,14 +97,6 @@ class ArcFaceTrainer:
         Returns:
             Dict: Training results
         """
-        import torch
-        import torch.optim as optim
-        import torch.nn.functional as F
-        from pathlib import Path
-        import time
-        import numpy as np
-        from torch.utils.data import DataLoader
-        
         # Setup device
         device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.model = self.model.to(device)
@@ -133,7 +124,6 @@ class ArcFaceTrainer:
         # Set up learning rate scheduler
         scheduler = None
         if hasattr(self.config, 'lr_scheduler_type') and self.config.lr_scheduler_type != 'none':
-            from .training_utils import get_scheduler
             scheduler_type = self.config.lr_scheduler_type
             scheduler_params = self.config.lr_scheduler_params or {}
             
@@ -146,7 +136,6 @@ class ArcFaceTrainer:
 
         early_stopping = None
         if hasattr(self.config, 'use_early_stopping') and self.config.use_early_stopping:
-            from .training_utils import EarlyStopping
             early_stopping = EarlyStopping(
                 patience=self.config.early_stopping_patience,
                 min_delta=self.config.early_stopping_min_delta,
@@ -165,27 +154,22 @@ class ArcFaceTrainer:
         # Check if training should be resumed from checkpoint
         if hasattr(self.config, 'resumable_training') and self.config.resumable_training:
             checkpoints_dir = Path(self.config.results_dir) / "checkpoints"
-            if checkpoints_dir.exists():
-                # Fix: correctly use list() on the result of glob()
-                checkpoint_files = list((Path(self.config.results_dir) / "checkpoints").glob("checkpoint_epoch_*.pth"))
-                if checkpoint_files:
-                    # Sort by epoch number
-                    checkpoint_files.sort(key=lambda x: int(str(x).split('_')[-1].split('.')[0]))
-                    latest_checkpoint = checkpoint_files[-1]
-                    
-                    print(f"Resuming training from checkpoint: {latest_checkpoint}")
-                    checkpoint = torch.load(latest_checkpoint, map_location=device)
-                    
-                    self.model.load_state_dict(checkpoint['model_state_dict'])
-                    optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
-                    
-                    # Restore scheduler state if available
-                    if scheduler and 'scheduler_state_dict' in checkpoint:
-                        scheduler.load_state_dict(checkpoint['scheduler_state_dict'])
-                    
-                    # Set start epoch
-                    start_epoch = checkpoint['epoch'] + 1
-                    print(f"Starting from epoch {start_epoch}")
+            # Highest epoch number, parsed from the file name
+            latest_checkpoint = find_latest_checkpoint(checkpoints_dir) if checkpoints_dir.exists() else None
+            if latest_checkpoint is not None:
+                print(f"Resuming training from checkpoint: {latest_checkpoint}")
+                checkpoint = torch.load(latest_checkpoint, map_location=device)
+                
+                self.model.load_state_dict(checkpoint['model_state_dict'])
+                optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+                
+                # Restore scheduler state if available
+                if scheduler and 'scheduler_state_dict' in checkpoint:
+                    scheduler.load_state_dict(checkpoint['scheduler_state_dict'])
+                
+                # Set start epoch
+                start_epoch = checkpoint['epoch'] + 1
+                print(f"Starting from epoch {start_epoch}")
         
         # Start training
         training_start_time = time.time()
@@ -212,7 +196,6 @@ class ArcFaceTrainer:
                 
                 # Apply gradient clipping if enabled
                 if hasattr(self.config, 'use_gradient_clipping') and self.config.use_gradient_clipping:
-                    from .training_utils import apply_gradient_clipping
                     apply_gradient_clipping(
                         model=self.model,
                         max_norm=self.config.gradient_clipping_max_norm,
@@ -342,7 +325,6 @@ class ArcFaceTrainer:
                     print(f"Early stopping triggered at epoch {epoch}")
                     # Save early stopping trace to a file
                     with open(Path(self.config.results_dir) / "logs" / "early_stopping_trace.json", 'w') as f:
-                        import json
                         json.dump({
                             "trace": early_stopping.trace,
                             "stopped_epoch": epoch,
@@ -400,7 +382,6 @@ def handle_special_architecture(architecture, model, train_dataset, val_dataset,
     
     except Exception as e:
         print(f"Error handling special architecture {architecture}: {str(e)}")
-        import traceback
         traceback.print_exc()
         
         return None, False
\ No newline at end of file
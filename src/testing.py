@@ -7,21 +7,60 @@ import numpy as np
 import pandas as pd
 import cv2
 import time
-import json
 from PIL import Image
 from pathlib import Path
 from typing import Dict, Optional, List, Tuple, Union, Any
 from torch.utils.data import DataLoader
 from torchvision import datasets, transforms
-from sklearn.metrics import confusion_matrix, roc_curve, auc, precision_recall_curve, precision_score, recall_score, f1_score, accuracy_score, roc_auc_score, average_precision_score
+from torchvision.datasets.folder import find_classes
+from sklearn.metrics import roc_curve, auc, precision_recall_curve, roc_auc_score, average_precision_score
 from tqdm import tqdm
 import random
 import os
+from contextlib import nullcontext
 
-from .base_config import PROC_DATA_DIR, CHECKPOINTS_DIR, OUT_DIR, logger, check_gpu
-from .face_models import get_model, MODEL_TYPES
-from .data_utils import SiameseDataset  # Updated import to use data_utils
-from .advanced_metrics import plot_confusion_matrix, create_enhanced_confusion_matrix
+from .base_config import PROC_DATA_DIR, CHECKPOINTS_DIR, OUT_DIR, logger, check_gpu, save_json
+from .face_models import get_model, MODEL_TYPES, CHANNELS_LAST_MODEL_TYPES
+from .data_utils import SiameseDataset, find_processed_datasets  # Updated import to use data_utils
+from .advanced_metrics import (plot_confusion_matrix, create_enhanced_confusion_matrix,
+                               bincount_confusion_matrix, metrics_from_confusion_matrix)
+
+class _InferenceTimer:
+    """Times the forward pass of each evaluation batch.
+    
+    CUDA work is asynchronous, so wall-clock time around model() only measures
+    the kernel launches. On the GPU we record CUDA events instead and read them
+    all back once after the loop. The first batch (cuDNN autotuning, lazy
+    initialisation) is left out of the results when there is more than one.
+    """
+    def __init__(self, device: torch.device):
+        self.use_events = device.type == 'cuda'
+        self._start = None
+        self._pending = []
+    
+    def start(self):
+        if self.use_events:
+            self._start = torch.cuda.Event(enable_timing=True)
+            self._start.record()
+        else:
+            self._start = time.perf_counter()
+    
+    def stop(self):
+        if self.use_events:
+            end = torch.cuda.Event(enable_timing=True)
+            end.record()
+            self._pending.append((self._start, end))
+        else:
+            self._pending.append(time.perf_counter() - self._start)
+    
+    def times(self) -> List[float]:
+        """Per-batch times in seconds, without the warmup batch."""
+        if self.use_events:
+            torch.cuda.synchronize()
+            times = [start.elapsed_time(end) / 1000 for start, end in self._pending]
+        else:
+            times = list(self._pending)
+        return times[1:] if len(times) > 1 else times
 
 def evaluate_model(model_type: str, model_name: Optional[str] = None, auto_dataset: bool = False):
     """Evaluate a trained model with comprehensive metrics."""
@@ -38,30 +77,7 @@ def evaluate_model(model_type: str, model_name: Optional[str] = None, auto_datas
     if not model_checkpoint_dir.exists():
         raise ValueError(f"Model not found: {model_name}")
     
-    processed_dirs = []
-    dataset_names = set()  # For deduplication
-    
-    # Check for the standard organization: config_name/dataset_name/test
-    config_dirs = [d for d in PROC_DATA_DIR.iterdir() if d.is_dir() and not d.name in ["train", "val", "test"]]
-    for config_dir in config_dirs:
-        if (config_dir / "test").exists():
-            # Use this directory with its name
-            if config_dir.name not in dataset_names:
-                processed_dirs.append((config_dir, config_dir.name))
-                dataset_names.add(config_dir.name)
-        else:
-            for dataset_dir in config_dir.iterdir():
-                if dataset_dir.is_dir() and (dataset_dir / "test").exists():
-                    # Use config/dataset naming
-                    dataset_path = f"{config_dir.name}/{dataset_dir.name}"
-                    if dataset_path not in dataset_names:
-                        processed_dirs.append((dataset_dir, dataset_path))
-                        dataset_names.add(dataset_path)
-    
-    if (PROC_DATA_DIR / "test").exists():
-        if "root" not in dataset_names:
-            processed_dirs.append((PROC_DATA_DIR, "processed (root)"))
-            dataset_names.add("root")
+    processed_dirs = find_processed_datasets(require=("test",))
     
     if not processed_dirs:
         raise ValueError("No processed datasets found with test data.")
@@ -109,7 +125,14 @@ def evaluate_model(model_type: str, model_name: Optional[str] = None, auto_datas
     else:
         test_dataset = datasets.ImageFolder(selected_data_dir / "test", transform=transform)
     
-    test_loader = DataLoader(test_dataset, batch_size=32, num_workers=0, pin_memory=True)
+    # Decode/resize in worker processes so the GPU isn't waiting on PIL. Siamese
+    # stays in-process: its dataset records image_pairs in __getitem__, and the
+    # identity analysis below reads them back from this process's copy
+    num_workers = 0 if model_type == 'siamese' else min(8, os.cpu_count() or 1)
+    loader_kwargs = dict(batch_size=32, num_workers=num_workers, pin_memory=device.type == 'cuda')
+    if num_workers > 0:
+        loader_kwargs['prefetch_factor'] = 4
+    test_loader = DataLoader(test_dataset, **loader_kwargs)
     
     # Load model
     num_classes = len(test_dataset.classes) if model_type != 'siamese' else 2
@@ -130,16 +153,30 @@ def evaluate_model(model_type: str, model_name: Optional[str] = None, auto_datas
     
     model.eval()
     
+    # NHWC layout for the models that support it (faster tensor-core convs)
+    memory_format = torch.channels_last if model_type in CHANNELS_LAST_MODEL_TYPES else torch.preserve_format
+    model = model.to(memory_format=memory_format)
+    
     # For ArcFace, we need a classifier for evaluation
     arcface_classifier = None
     if model_type == 'arcface':
         arcface_classifier = nn.Linear(512, num_classes).to(device)
     
-    # Initialize metrics
-    all_predictions = []
-    all_targets = []
-    all_probs = []
-    total_loss = 0
+    # Initialize metrics. Classifiers fill pre-sized buffers on the device batch by
+    # batch and copy them to the host once after the loop (no per-batch sync);
+    # siamese keeps lists since its identity bookkeeping works off list lengths
+    if model_type == 'siamese':
+        all_predictions = []
+        all_targets = []
+        all_probs = []
+    else:
+        n_samples = len(test_dataset)
+        all_predictions = torch.empty(n_samples, dtype=torch.long, device=device)
+        all_targets = torch.empty(n_samples, dtype=torch.long, device=device)
+        all_probs = torch.empty((n_samples, num_classes), dtype=torch.float32, device=device)
+        n_collected = 0
+    # Summed on the device (weighted by batch size) and read back once after the loop
+    total_loss = torch.zeros((), device=device)
     criterion = nn.CrossEntropyLoss() if model_type != 'siamese' else nn.BCEWithLogitsLoss()
     
     # For siamese networks, also track identities for person-by-person analysis
@@ -161,21 +198,32 @@ def evaluate_model(model_type: str, model_name: Optional[str] = None, auto_datas
         logger.info(f"Created identity map with {len(identity_map)} images across {len(set(identity_map.values()))} identities")
     
     # Measure inference time
-    inference_times = []
-    
-    # Evaluation loop
-    with torch.no_grad():
+    timer = _InferenceTimer(device)
+    
+    # Every full batch has the same shape, so let cuDNN pick its fastest kernels
+    # (the autotuning lands in the first batch, which the timer leaves out)
+    if device.type == 'cuda':
+        torch.backends.cudnn.benchmark = True
+    
+    # Evaluation loop. fp16 autocast on the GPU; outputs are cast back to fp32
+    # before the loss, distances and softmax so the metrics compare like for like.
+    # inference_mode except for ArcFace (and the ensemble holding one), whose eval
+    # forward rewrites val_classifier.weight.data
+    # (nullcontext off the GPU - a disabled CPU fp16 autocast can still warn on older torch)
+    autocast = torch.autocast(device_type='cuda', dtype=torch.float16) if device.type == 'cuda' else nullcontext()
+    with torch.no_grad(), torch.inference_mode(model_type not in ('arcface', 'ensemble')), autocast:
         for batch in tqdm(test_loader, desc='Evaluating'):
             if model_type == 'siamese':
                 img1, img2, labels = batch
-                img1, img2 = img1.to(device), img2.to(device)
+                # The loader pins its batches, so the copies can be async
+                img1, img2 = img1.to(device, non_blocking=True), img2.to(device, non_blocking=True)
                 
                 # Measure inference time
-                start_time = time.time()
+                timer.start()
                 out1, out2 = model(img1, img2)
-                dist = F.pairwise_distance(out1, out2)
+                dist = F.pairwise_distance(out1.float(), out2.float())
                 pred = (dist < 0.5).float()
-                inference_times.append(time.time() - start_time)
+                timer.stop()
                 
                 all_predictions.extend(pred.cpu().numpy())
                 all_targets.extend(labels.numpy())
@@ -248,11 +296,11 @@ def evaluate_model(model_type: str, model_name: Optional[str] = None, auto_datas
                         logger.error(f"Failed to extract identity information using fallback method: {str(e)}")
             else:
                 images, labels = batch
-                images = images.to(device)
-                labels = labels.to(device)
+                images = images.to(device, non_blocking=True, memory_format=memory_format)
+                labels = labels.to(device, non_blocking=True)
                 
                 # Measure inference time
-                start_time = time.time()
+                timer.start()
                 
                 # Handle different model architectures
                 if model_type == 'arcface':
@@ -269,29 +317,43 @@ def evaluate_model(model_type: str, model_name: Optional[str] = None, auto_datas
                         )
                 else:
                     outputs = model(images)
+                outputs = outputs.float()
                 
-                inference_times.append(time.time() - start_time)
+                timer.stop()
                 
                 loss = criterion(outputs, labels)
-                total_loss += loss.item()
+                total_loss += loss.detach() * labels.size(0)
                 
-                probs = F.softmax(outputs, dim=1)
-                _, predicted = torch.max(outputs, 1)
+                # Softmax is monotonic, so the class comes straight from the logits;
+                # the full probability rows are still needed for ROC/PR AUC
+                predicted = outputs.argmax(dim=1)
+                probs = outputs.softmax(dim=1)
                 
-                all_predictions.extend(predicted.cpu().numpy())
-                all_targets.extend(labels.cpu().numpy())
-                all_probs.extend(probs.cpu().numpy())
-    
-    # Convert to numpy arrays
-    all_predictions = np.array(all_predictions)
-    all_targets = np.array(all_targets)
-    all_probs = np.array(all_probs)
+                n = labels.size(0)
+                all_predictions[n_collected:n_collected + n] = predicted
+                all_targets[n_collected:n_collected + n] = labels
+                all_probs[n_collected:n_collected + n] = probs
+                n_collected += n
     
-    # Calculate metrics
-    accuracy = accuracy_score(all_targets, all_predictions)
-    precision = precision_score(all_targets, all_predictions, average='weighted')
-    recall = recall_score(all_targets, all_predictions, average='weighted')
-    f1 = f1_score(all_targets, all_predictions, average='weighted')
+    # Convert to numpy arrays; for classifiers this is the one device-to-host copy
+    if model_type == 'siamese':
+        all_predictions = np.asarray(all_predictions)
+        all_targets = np.asarray(all_targets)
+        all_probs = np.asarray(all_probs)
+    else:
+        all_predictions = all_predictions.cpu().numpy()
+        all_targets = all_targets.cpu().numpy()
+        all_probs = all_probs.cpu().numpy()
+    
+    # Calculate metrics. All four come from one confusion matrix instead of four
+    # sklearn passes over the labels (weighted by support, zero_division=0 like sklearn)
+    cm = bincount_confusion_matrix(all_targets, all_predictions, num_classes)
+    class_precision, class_recall, class_f1, support = metrics_from_confusion_matrix(cm)
+    weights = support / max(support.sum(), 1)
+    accuracy = np.trace(cm) / max(cm.sum(), 1)
+    precision = float(class_precision @ weights)
+    recall = float(class_recall @ weights)
+    f1 = float(class_f1 @ weights)
     
     # Calculate ROC AUC
     if model_type == 'siamese':
@@ -312,7 +374,7 @@ def evaluate_model(model_type: str, model_name: Optional[str] = None, auto_datas
         pr_auc = average_precision_score(all_targets, all_probs)
     
     # Calculate average inference time
-    avg_inference_time = np.mean(inference_times)
+    avg_inference_time = np.mean(timer.times())
     
     # Print metrics
     print("\nEvaluation Metrics:")
@@ -324,7 +386,8 @@ def evaluate_model(model_type: str, model_name: Optional[str] = None, auto_datas
     print(f"PR AUC: {pr_auc:.4f}")
     print(f"Average Inference Time: {avg_inference_time*1000:.2f} ms")
     if model_type != 'siamese':
-        print(f"Test Loss: {total_loss/len(test_loader):.4f}")
+        # Per-sample mean, so a short last batch doesn't skew it
+        print(f"Test Loss: {total_loss.item() / max(n_collected, 1):.4f}")
     
     # Determine class names
     if model_type == 'siamese':
@@ -342,12 +405,12 @@ def evaluate_model(model_type: str, model_name: Optional[str] = None, auto_datas
         class_names = test_dataset.classes
         logger.info(f"Using {len(class_names)} classes from dataset: {class_names}")
     
-    # Save raw predictions for visualization
+    # Save raw predictions for visualization. The arrays go in as-is,
+    # save_json serializes numpy directly
     model_results = {
-        "predictions": all_predictions.tolist() if hasattr(all_predictions, 'tolist') else all_predictions,
-        "targets": all_targets.tolist() if hasattr(all_targets, 'tolist') else all_targets,
-        "probabilities": all_probs.tolist() if hasattr(all_probs, 'tolist') and (not hasattr(all_probs, 'ndim') or all_probs.ndim <= 2) 
-                        else [p.tolist() if hasattr(p, 'tolist') else p for p in all_probs],
+        "predictions": all_predictions,
+        "targets": all_targets,
+        "probabilities": all_probs,
         "class_names": class_names,
         "metrics": {
             "accuracy": float(accuracy),
@@ -372,8 +435,7 @@ def evaluate_model(model_type: str, model_name: Optional[str] = None, auto_datas
     else:
         results_file = model_viz_dir / f'{model_type}_model_results.json'
     
-    with open(results_file, 'w') as f:
-        json.dump(model_results, f, indent=2)
+    save_json(model_results, results_file)
     
     logger.info(f"Saved model predictions to {results_file}")
     
@@ -388,8 +450,7 @@ def evaluate_model(model_type: str, model_name: Optional[str] = None, auto_datas
         "class_names": model_results["class_names"]
     }
     
-    with open(summary_file, 'w') as f:
-        json.dump(experiment_summary, f, indent=2)
+    save_json(experiment_summary, summary_file)
     
     logger.info(f"Saved experiment summary to {summary_file}")
     
@@ -403,6 +464,7 @@ def evaluate_model(model_type: str, model_name: Optional[str] = None, auto_datas
         classes=class_names, 
         output_dir=str(model_viz_dir), 
         model_name=model_name,
+        cm=cm,  # Reuse the matrix the metrics came from
         detailed=True  # Use detailed view with per-class metrics
     )
     
@@ -554,8 +616,8 @@ def predict_image(model_type: str, image_path: str, model_name: Optional[str] =
     if model_type == 'siamese':
         raise ValueError("Siamese model can't be used for direct prediction. Use it for verification.")
     else:
-        dataset = datasets.ImageFolder(dataset_path / "train")
-        classes = dataset.classes
+        # Only the class folder names are needed, not a walk over every image
+        classes, _ = find_classes(dataset_path / "train")
     
     # Setup transform
     transform = transforms.Compose([
@@ -587,10 +649,17 @@ def predict_image(model_type: str, image_path: str, model_name: Optional[str] =
     
     model.eval()
     
+    # Same inference setup as evaluate_model: NHWC for the models that support it
+    # and fp16 autocast on the GPU, with the softmax done in fp32
+    memory_format = torch.channels_last if model_type in CHANNELS_LAST_MODEL_TYPES else torch.preserve_format
+    model = model.to(memory_format=memory_format)
+    image_tensor = image_tensor.to(memory_format=memory_format)
+    
     # Make prediction
-    with torch.no_grad():
+    autocast = torch.autocast(device_type='cuda', dtype=torch.float16) if device.type == 'cuda' else nullcontext()
+    with torch.no_grad(), autocast:
         outputs = model(image_tensor)
-        probs = F.softmax(outputs, dim=1)
-        prob, pred_idx = torch.max(probs, 1)
+    probs = F.softmax(outputs.float(), dim=1)
+    prob, pred_idx = torch.max(probs, 1)
         
     return classes[pred_idx.item()], prob.item()
\ No newline at end of file
@@ -1,12 +1,14 @@
 #!/usr/bin/env python3
 
 import os
+import json
 import random
 import torch
 import torch.nn as nn
 import torch.optim as optim
 from torch.utils.data import DataLoader
 from torchvision import datasets, transforms
+from torchvision.datasets.folder import find_classes
 import torch.nn.functional as F
 from pathlib import Path
 from typing import Dict, Optional, List, Tuple, Union, Any
@@ -22,7 +24,7 @@ from torch.optim.lr_scheduler import ReduceLROnPlateau, CosineAnnealingLR, StepL
 SchedulerType = Union[ReduceLROnPlateau, CosineAnnealingLR, StepLR, None]
 
 from .base_config import PROC_DATA_DIR, CHECKPOINTS_DIR, logger
-from .face_models import get_model, get_criterion
+from .face_models import get_model, get_criterion, ArcFaceNet
 from .data_utils import SiameseDataset
 from .lr_finder import LearningRateFinder
 from .advanced_metrics import plot_confusion_matrix
@@ -310,18 +312,17 @@ def train_model(model_type: str, model_name: Optional[str] = None,
     ])
     
     # Initialize model
-    # Use first dataset to determine number of classes
+    # Use first dataset to determine number of classes. Only the class folders
+    # are listed here - the full image scan happens once, in the training loop
     if model_type == 'siamese':
-        first_dataset = SiameseDataset(str(selected_data_dirs[0] / "train"), transform=transform)
         num_classes = 2
     else:
-        first_dataset = datasets.ImageFolder(selected_data_dirs[0] / "train", transform=transform)
-        num_classes = len(first_dataset.classes)
+        classes, _ = find_classes(selected_data_dirs[0] / "train")
+        num_classes = len(classes)
     
     # Create model with special handling for ArcFace
     if model_type == 'arcface':
         # Initialize ArcFace with advanced parameters
-        from .face_models import ArcFaceNet  # Import for direct initialization
         model = ArcFaceNet(
             num_classes=num_classes,
             dropout_rate=0.2,  # Lower dropout for better convergence
@@ -562,12 +563,15 @@ def train_model(model_type: str, model_name: Optional[str] = None,
             val_loss = 0.0
             correct = 0
             total = 0
-            y_true = []
-            y_pred = []
-            
             # Optimize by using smaller validation samples to prevent freezing
             val_sample_size = min(len(val_loader), 20)  # Limit validation to 20 batches max
             
+            # Pre-sized buffers for predictions/targets, filled a batch at a time
+            val_buffer_size = min(len(val_loader.dataset), val_sample_size * val_loader.batch_size)
+            y_true = np.empty(val_buffer_size, dtype=np.int64)
+            y_pred = np.empty(val_buffer_size, dtype=np.int64)
+            n_collected = 0
+            
             with torch.no_grad():
                 for batch_idx, batch in enumerate(val_loader):
                     # Break after processing val_sample_size batches to prevent freezing
@@ -596,8 +600,10 @@ def train_model(model_type: str, model_name: Optional[str] = None,
                                 logger.info(f"Validation | Batch {batch_idx}/{val_sample_size} | Loss: {batch_loss:.4f} | Current Acc: {current_acc*100:.2f}%")
                             
                             # Collect predictions and targets for metrics
-                            y_true.extend(target.cpu().numpy().tolist())
-                            y_pred.extend(pred.cpu().numpy().tolist())
+                            n = target.size(0)
+                            y_true[n_collected:n_collected + n] = target.cpu().numpy()
+                            y_pred[n_collected:n_collected + n] = pred.cpu().numpy()
+                            n_collected += n
                             
                         except Exception as e:
                             logger.error(f"Error during validation: {e}")
@@ -624,8 +630,14 @@ def train_model(model_type: str, model_name: Optional[str] = None,
                         total += target.size(0)
                         
                         # Collect predictions and targets for metrics
-                        y_true.extend(target.cpu().numpy().tolist())
-                        y_pred.extend(pred.cpu().numpy().tolist())
+                        n = target.size(0)
+                        y_true[n_collected:n_collected + n] = target.cpu().numpy()
+                        y_pred[n_collected:n_collected + n] = pred.cpu().numpy()
+                        n_collected += n
+            
+            # Drop the unused tail (batches can be skipped on error)
+            y_true = y_true[:n_collected]
+            y_pred = y_pred[:n_collected]
             
             # Calculate epoch metrics
             epoch_loss = train_loss / len(train_loader)
@@ -658,14 +670,11 @@ def train_model(model_type: str, model_name: Optional[str] = None,
             # Print more detailed accuracy metrics for Siamese networks
             if model_type == 'siamese':
                 # Calculate metrics by class
-                y_true_np = np.array(y_true)
-                y_pred_np = np.array(y_pred)
-                
                 # Class 0 = same person, Class 1 = different person
-                class0_correct = np.sum((y_true_np == 0) & (y_pred_np == 0))
-                class0_total = np.sum(y_true_np == 0)
-                class1_correct = np.sum((y_true_np == 1) & (y_pred_np == 1))
-                class1_total = np.sum(y_true_np == 1)
+                class0_correct = np.sum((y_true == 0) & (y_pred == 0))
+                class0_total = np.sum(y_true == 0)
+                class1_correct = np.sum((y_true == 1) & (y_pred == 1))
+                class1_total = np.sum(y_true == 1)
                 
                 # Calculate class accuracies
                 class0_acc = class0_correct / max(1, class0_total)
@@ -781,12 +790,15 @@ def train_model(model_type: str, model_name: Optional[str] = None,
     test_loss = 0.0
     correct = 0
     total = 0
-    all_y_true = []
-    all_y_pred = []
-    
     # Limit test evaluation sample size to prevent freezing
     test_sample_size = min(len(test_loader), 30)  # Use max 30 batches for testing
     
+    # Pre-sized buffers for predictions/targets, filled a batch at a time
+    test_buffer_size = min(len(test_loader.dataset), test_sample_size * test_loader.batch_size)
+    all_y_true = np.empty(test_buffer_size, dtype=np.int64)
+    all_y_pred = np.empty(test_buffer_size, dtype=np.int64)
+    n_collected = 0
+    
     with torch.no_grad():
         for batch_idx, batch in enumerate(test_loader):
             # Break after processing test_sample_size batches to prevent freezing
@@ -817,8 +829,10 @@ def train_model(model_type: str, model_name: Optional[str] = None,
                         logger.info(f"Test | Batch {batch_idx}/{test_sample_size} | Loss: {batch_loss:.4f} | Current Acc: {current_acc*100:.2f}%")
                     
                     # Collect predictions and targets for metrics
-                    all_y_true.extend(target.cpu().numpy().tolist())
-                    all_y_pred.extend(pred.cpu().numpy().tolist())
+                    n = target.size(0)
+                    all_y_true[n_collected:n_collected + n] = target.cpu().numpy()
+                    all_y_pred[n_collected:n_collected + n] = pred.cpu().numpy()
+                    n_collected += n
                     
                 except Exception as e:
                     logger.error(f"Error during test evaluation: {e}")
@@ -843,8 +857,14 @@ def train_model(model_type: str, model_name: Optional[str] = None,
                 total += target.size(0)
                 
                 # Collect predictions and targets for metrics
-                all_y_true.extend(target.cpu().numpy().tolist())
-                all_y_pred.extend(pred.cpu().numpy().tolist())
+                n = target.size(0)
+                all_y_true[n_collected:n_collected + n] = target.cpu().numpy()
+                all_y_pred[n_collected:n_collected + n] = pred.cpu().numpy()
+                n_collected += n
+    
+    # Drop the unused tail (batches can be skipped on error)
+    all_y_true = all_y_true[:n_collected]
+    all_y_pred = all_y_pred[:n_collected]
     
     # Calculate test accuracy
     test_accuracy = correct / total
@@ -852,13 +872,10 @@ def train_model(model_type: str, model_name: Optional[str] = None,
     
     # Generate confusion matrix for non-siamese models
     if model_type != 'siamese':
-        all_y_true_arr = np.array(all_y_true)
-        all_y_pred_arr = np.array(all_y_pred)
-        
-        cm = confusion_matrix(all_y_true_arr, all_y_pred_arr)
+        cm = confusion_matrix(all_y_true, all_y_pred)
         plot_confusion_matrix(
-            y_true=all_y_true_arr,
-            y_pred=all_y_pred_arr,
+            y_true=all_y_true,
+            y_pred=all_y_pred,
             classes=train_dataset.classes, 
             output_dir=str(plots_dir),
             model_name=model_name,
@@ -907,11 +924,9 @@ def train_model(model_type: str, model_name: Optional[str] = None,
     
     # Save to both locations for convenience
     with open(model_checkpoint_dir / 'model_info.json', 'w') as f:
-        import json
         json.dump(model_info, f, indent=4)
         
     with open(metrics_dir / 'model_info.json', 'w') as f:
-        import json
         json.dump(model_info, f, indent=4)
         
     # Log the locations for user reference
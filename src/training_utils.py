@@ -1,18 +1,20 @@
 #!/usr/bin/env python3
 
 import os
+import re
+import fnmatch
 import torch
 import torch.nn as nn
 import numpy as np
-import matplotlib.pyplot as plt
 from pathlib import Path
 from typing import Dict, Optional, List, Tuple, Union, Any, Callable
 from enum import Enum
 import datetime
 import json
-import glob
+from sklearn.metrics import precision_score, recall_score, f1_score
 
 from .base_config import logger
+from .advanced_metrics import create_enhanced_confusion_matrix
 
 
 class EarlyStopping:
@@ -283,19 +285,51 @@ def prune_checkpoints(checkpoint_dir: Path, keep: int = 5, pattern: str = "check
         keep: Number of most recent checkpoints to keep
         pattern: Glob pattern to match checkpoint files
     """
-    # Get all checkpoint files matching the pattern
-    checkpoint_files = glob.glob(str(checkpoint_dir / pattern))
+    # One scandir pass; DirEntry caches the stat so sorting by mtime is free
+    pattern_re = re.compile(fnmatch.translate(pattern))
+    with os.scandir(checkpoint_dir) as entries:
+        checkpoint_files = [(entry.stat().st_mtime, entry.path) for entry in entries
+                            if entry.is_file() and pattern_re.match(entry.name)]
     
     # Sort by modification time (newest first)
-    checkpoint_files.sort(key=os.path.getmtime, reverse=True)
+    checkpoint_files.sort(reverse=True)
     
     # Delete old checkpoints beyond the number to keep
-    for filepath in checkpoint_files[keep:]:
+    pruned = 0
+    for _, filepath in checkpoint_files[keep:]:
         try:
             os.remove(filepath)
-            logger.info(f"Pruned old checkpoint: {filepath}")
+            pruned += 1
         except Exception as e:
             logger.error(f"Error removing checkpoint {filepath}: {str(e)}")
+    
+    if pruned:
+        logger.info(f"Pruned {pruned} old checkpoint(s) from {checkpoint_dir}")
+
+
+# Matches the names written by ResultsManager.save_model_checkpoint,
+# e.g. checkpoint_epoch_12_acc0.9350.pth
+_CHECKPOINT_EPOCH_RE = re.compile(r"^checkpoint_epoch_(\d+)(?:_.*)?\.pth$")
+
+
+def find_latest_checkpoint(checkpoint_dir: Path) -> Optional[Path]:
+    """
+    Find the checkpoint with the highest epoch number in a directory.
+    
+    Args:
+        checkpoint_dir: Directory containing checkpoint_epoch_*.pth files
+        
+    Returns:
+        Path to the latest checkpoint, or None if there are none
+    """
+    latest_epoch, latest_path = -1, None
+    with os.scandir(checkpoint_dir) as entries:
+        for entry in entries:
+            match = _CHECKPOINT_EPOCH_RE.match(entry.name)
+            if match and int(match.group(1)) > latest_epoch:
+                latest_epoch, latest_path = int(match.group(1)), entry.path
+    
+    return Path(latest_path) if latest_path is not None else None
 
 
 class SimpleResultsManager:
@@ -387,7 +421,6 @@ class SimpleResultsManager:
     
     def record_confusion_matrix(self, y_true, y_pred, class_names):
         """Record confusion matrix."""
-        from .advanced_metrics import create_enhanced_confusion_matrix
         cm_data = create_enhanced_confusion_matrix(y_true, y_pred, class_names)
         
         with open(self.metrics_dir / "confusion_matrix.json", 'w') as f:
@@ -396,8 +429,6 @@ class SimpleResultsManager:
     def record_per_class_metrics(self, y_true, y_pred, y_score, class_names):
         """Record basic per-class metrics without detailed calculation."""
         # Calculate basic per-class metrics directly
-        from sklearn.metrics import precision_score, recall_score, f1_score
-        
         precision = precision_score(y_true, y_pred, average=None, zero_division=0)
         recall = recall_score(y_true, y_pred, average=None, zero_division=0)
         f1 = f1_score(y_true, y_pred, average=None, zero_division=0)